@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from redis import asyncio as redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cache import CODECS, decode, encode, zstandard
+from config import settings
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+RESOURCES = ["films", "people", "planets", "species", "starships", "vehicles"]
+
+def formats() -> dict:
+    result = {"json (legacy)": (lambda value: json.dumps(value).encode(), json.loads)}
+    for codec in sorted(CODECS):
+        result[codec] = (lambda value, codec=codec: encode(value, codec, compress_min_size=0), decode)
+        if zstandard is not None:
+            result[f"{codec}+zstd"] = (lambda value, codec=codec: encode(value, codec, compress_min_size=settings.CACHE_COMPRESSION_MIN_SIZE), decode)
+    return result
+
+async def load_entities(client: httpx.AsyncClient, resources: list[str]) -> dict:
+    entities = {}
+    for resource in resources:
+        response = await client.get(f"/export/{resource}.ndjson")
+        response.raise_for_status()
+        for line in response.text.splitlines():
+            item = json.loads(line)
+            entities[f"{resource}/{item['url'].rstrip('/').split('/')[-1]}"] = {"data": item, "fresh_until": time.time()}
+    return entities
+
+async def measure(store: redis.Redis, label: str, dumps, loads, entities: dict, rounds: int):
+    encoded = {f"bench:codec:{label}:{key}": dumps(value) for key, value in entities.items()}
+    async with store.pipeline(transaction=False) as pipe:
+        for key, value in encoded.items():
+            pipe.set(key, value)
+        await pipe.execute()
+    async with store.pipeline(transaction=False) as pipe:
+        for key in encoded:
+            pipe.memory_usage(key)
+        usages = await pipe.execute()
+    await store.delete(*encoded)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for value in encoded.values():
+            loads(value)
+    decoded = rounds * len(encoded) / (time.perf_counter() - started)
+    payload = sum(len(value) for value in encoded.values()) / len(encoded)
+    print(f"{label:>16}: {payload:8.0f} bytes  {sum(usages) / len(usages):8.0f} bytes in Redis  {decoded:10.0f} decodes/s")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare Redis memory per entity and decode throughput for each cache codec")
+    parser.add_argument("--url", default="http://localhost:8080", help="running API, used to export the entities")
+    parser.add_argument("--redis", default=settings.REDIS_URL)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("resources", nargs="*", default=RESOURCES)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        entities = await load_entities(client, args.resources)
+    print(f"{len(entities)} entities, zstd threshold {settings.CACHE_COMPRESSION_MIN_SIZE} bytes")
+    store = redis.from_url(args.redis)
+    try:
+        for label, (dumps, loads) in formats().items():
+            await measure(store, label, dumps, loads, entities, args.rounds)
+    finally:
+        await store.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
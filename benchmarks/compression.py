@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import gzip
+import logging
+import time
+
+import httpx
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+PATHS = ["/films?people=true&planets=true", "/people?n=50&films=true&homeworld=true"]
+
+def time_compression(label: str, compress, body: bytes, rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        size = len(compress(body))
+    elapsed = (time.perf_counter() - started) / rounds * 1000
+    print(f"  {label:>8}: {size:8d} bytes  {elapsed:7.2f}ms per compression")
+
+async def throughput(client: httpx.AsyncClient, path: str, encoding: str, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    downloaded = 0
+
+    async def hit():
+        nonlocal downloaded
+        async with semaphore:
+            response = await client.get(path, headers={"Accept-Encoding": encoding})
+            response.raise_for_status()
+            downloaded += response.num_bytes_downloaded
+
+    started = time.perf_counter()
+    await asyncio.gather(*(hit() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    print(f"  {encoding:>8}: {requests / elapsed:8.0f} req/s  {downloaded / requests:9.0f} bytes per response")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare response sizes and throughput per content encoding for film and people listings")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--path", action="append", dest="paths")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        for path in args.paths or PATHS:
+            response = await client.get(path, headers={"Accept-Encoding": "identity"})
+            response.raise_for_status()
+            print(path)
+            print(f"  {'identity':>8}: {len(response.content):8d} bytes")
+            time_compression("gzip", lambda body: gzip.compress(body, compresslevel=6), response.content, args.rounds)
+            if brotli is not None:
+                time_compression("br", lambda body: brotli.compress(body, quality=5), response.content, args.rounds)
+            for encoding in ("identity", "gzip", "br"):
+                await throughput(client, path, encoding, args.requests, args.concurrency)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+async def measure(client: httpx.AsyncClient, path: str, samples: int) -> list[float]:
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+async def login_storm(client: httpx.AsyncClient, username: str, password: str, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            await client.post("/token", data={"username": username, "password": password})
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+
+def report(label: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:>14}: p50={statistics.median(latencies):7.1f}ms  p95={p95:7.1f}ms  max={latencies[-1]:7.1f}ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure /films latency while a burst of logins is running")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--path", default="/films")
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    password = "bench123"
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        await client.post("/register", json={"username": username, "password": password})
+        response = await client.post("/token", data={"username": username, "password": password})
+        token = response.json()["access_token"]
+        await client.get(args.path)
+
+        report("idle", await measure(client, args.path, args.samples))
+        storm = asyncio.create_task(login_storm(client, username, password, args.logins, args.concurrency))
+        report("login storm", await measure(client, args.path, args.samples))
+        await storm
+        await client.delete("/user", headers={"Authorization": f"Bearer {token}"})
+
+if __name__ == "__main__":
+    asyncio.run(main())
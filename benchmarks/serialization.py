@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from routers.films import film
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+def time_serializer(label: str, serialize, payload: dict, rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        serialize(payload)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>22}: {rounds / elapsed:9.0f} ops/s")
+
+async def throughput(client: httpx.AsyncClient, path: str, requests: int, concurrency: int, bust: bool) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def hit():
+        async with semaphore:
+            params = {"_bench": uuid.uuid4().hex} if bust else None
+            response = await client.get(path, params=params)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(hit() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare serialization paths and requests/sec with and without the response bytes cache")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--path", default="/films/1?people=true")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5000)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        response = await client.get(args.path)
+        response.raise_for_status()
+        payload = response.json()
+
+        time_serializer("jsonable + json.dumps", lambda data: json.dumps(jsonable_encoder(film(**data))).encode(), payload, args.rounds)
+        time_serializer("model_dump_json", lambda data: film(**data).model_dump_json(exclude_unset=True).encode(), payload, args.rounds)
+        time_serializer("model + orjson", lambda data: orjson.dumps(film(**data).model_dump(exclude_unset=True)), payload, args.rounds)
+        time_serializer("cached bytes", lambda data: response.content, payload, args.rounds)
+
+        # A unique throwaway query parameter misses the response cache, so every
+        # request rebuilds and serializes the model from the object cache.
+        before = await throughput(client, args.path, args.requests, args.concurrency, bust=True)
+        after = await throughput(client, args.path, args.requests, args.concurrency, bust=False)
+        print(f"{'rebuilt per request':>22}: {before:9.0f} req/s")
+        print(f"{'response cache':>22}: {after:9.0f} req/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,68 @@
+import logging
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Optional
+
+import orjson
 from redis import asyncio as redis
 from config import settings
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
 redis_client = None
+binary_redis_client = None
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: int = None):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = (value, time.monotonic() + (ttl or self.ttl))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self.entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+local_cache = LRUCache(settings.L1_CACHE_SIZE, settings.L1_CACHE_TTL)
 
 async def get_redis():
     global redis_client
@@ -10,6 +71,12 @@ async def get_redis():
         redis_client = await redis.from_url(redis_url, decode_responses=True)
     return redis_client
 
+async def get_binary_redis():
+    global binary_redis_client
+    if binary_redis_client is None:
+        binary_redis_client = await redis.from_url(settings.REDIS_URL)
+    return binary_redis_client
+
 async def get_cache(key: str):
     redis = await get_redis()
     return await redis.get(key)
@@ -19,5 +86,235 @@ async def set_cache(key: str, value: str, ex: int = 60):
     return await redis.set(key, value, ex=ex)
 
 async def delete_cache(key: str):
+    local_cache.delete(key)
+    redis = await get_redis()
+    return await redis.delete(key)
+
+async def get_many(keys: list[str]) -> list:
+    if not keys:
+        return []
+    redis = await get_redis()
+    return await redis.mget(keys)
+
+async def set_many(mapping: dict, ex: int = 60):
+    if not mapping:
+        return []
+    redis = await get_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=ex)
+        return await pipe.execute()
+
+async def get_encoded(keys: list[str]) -> list:
+    if not keys:
+        return []
+    redis = await get_binary_redis()
+    return await redis.mget(keys)
+
+async def set_encoded(mapping: dict, ex: int = 60):
+    if not mapping:
+        return []
+    redis = await get_binary_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=ex)
+        return await pipe.execute()
+
+# Encoded values start with one header byte: the low bits name the codec
+# and ZSTD_FLAG marks a compressed payload. JSON written before the codec
+# layer starts with a printable character, so it is still read as is.
+ZSTD_FLAG = 0x10
+LEGACY_HEADER = 0x20
+
+CODECS = {"orjson": (0x01, orjson.dumps, orjson.loads)}
+if msgpack is not None:
+    CODECS["msgpack"] = (0x02, msgpack.packb, msgpack.unpackb)
+DECODERS = {codec_id: loads for codec_id, dumps, loads in CODECS.values()}
+if settings.CACHE_CODEC not in CODECS:
+    logger.warning(f"Cache codec {settings.CACHE_CODEC} is not available, using orjson")
+
+zstd_compressor = zstandard.ZstdCompressor(level=settings.CACHE_ZSTD_LEVEL) if zstandard is not None else None
+zstd_decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+def encode(value, codec: Optional[str] = None, compress_min_size: Optional[int] = None) -> bytes:
+    codec_id, dumps, _ = CODECS.get(codec or settings.CACHE_CODEC, CODECS["orjson"])
+    payload = dumps(value)
+    if compress_min_size is None:
+        compress_min_size = settings.CACHE_COMPRESSION_MIN_SIZE
+    if zstd_compressor is not None and compress_min_size > 0 and len(payload) >= compress_min_size:
+        return bytes([codec_id | ZSTD_FLAG]) + zstd_compressor.compress(payload)
+    return bytes([codec_id]) + payload
+
+def decode(raw: bytes):
+    header = raw[0]
+    if header >= LEGACY_HEADER:
+        return orjson.loads(raw)
+    payload = raw[1:]
+    if header & ZSTD_FLAG:
+        if zstd_decompressor is None:
+            raise ValueError("Cached value is zstd-compressed but zstandard is not installed")
+        payload = zstd_decompressor.decompress(payload)
+    loads = DECODERS.get(header & ~ZSTD_FLAG)
+    if loads is None:
+        raise ValueError(f"Unknown cache codec {header:#04x}")
+    return loads(payload)
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Values are stored as "version:value" and only replaced by a newer version,
+# so a writer that read before a concurrent update cannot undo it.
+SET_VERSIONED_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current then
+    local version = tonumber(string.match(current, '^(%-?%d+):'))
+    if version and version >= tonumber(ARGV[1]) then
+        return 0
+    end
+end
+redis.call('set', KEYS[1], ARGV[1] .. ':' .. ARGV[2], 'ex', ARGV[3])
+return 1
+"""
+
+def split_versioned(value: str) -> tuple[int, str]:
+    version, _, value = value.rpartition(":")
+    return int(version or -1), value
+
+async def set_versioned_many(mapping: dict, ex: int = 60):
+    if not mapping:
+        return []
+    redis = await get_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, (version, value) in mapping.items():
+            pipe.eval(SET_VERSIONED_SCRIPT, 1, key, version, value, ex)
+        return await pipe.execute()
+
+async def acquire_lock(name: str, ttl_ms: int):
+    token = uuid.uuid4().hex
+    redis = await get_redis()
+    if await redis.set(f"lock:{name}", token, nx=True, px=ttl_ms):
+        return token
+    return None
+
+async def release_lock(name: str, token: str):
     redis = await get_redis()
-    return await redis.delete(key)
\ No newline at end of file
+    return await redis.eval(RELEASE_LOCK_SCRIPT, 1, f"lock:{name}", token)
+
+class Missing:
+    def __init__(self, status: int):
+        self.status = status
+
+def wrap(value, ttl: int) -> bytes:
+    return encode({"data": value, "fresh_until": time.time() + ttl})
+
+def unwrap(stored) -> tuple:
+    # Values written before soft expiry existed are plain objects; they are
+    # treated as fresh until their Redis TTL runs out.
+    if isinstance(stored, dict) and "fresh_until" in stored:
+        if stored["data"] is None:
+            return Missing(stored.get("status", 404)), stored["fresh_until"] - time.time()
+        return stored["data"], stored["fresh_until"] - time.time()
+    return stored, local_cache.ttl
+
+# Objects handed out or stored are shallow-copied: callers replace relation
+# fields in place while expanding, which must not leak into the L1 entries.
+# Keys known not to exist upstream are reported in missing, not in the result.
+async def get_objects(keys: list[str], stale: Optional[set] = None, missing: Optional[dict] = None) -> dict:
+    found = {}
+    remaining = []
+    for key in keys:
+        value = local_cache.get(key)
+        if value is None:
+            remaining.append(key)
+        elif isinstance(value, Missing):
+            if missing is not None:
+                missing[key] = value.status
+        else:
+            found[key] = dict(value)
+    if not remaining:
+        return found
+    try:
+        stored = await get_encoded(remaining)
+    except Exception as e:
+        logger.error(f"Error reading cache: {e}")
+        return found
+    for key, cached_data in zip(remaining, stored):
+        if not cached_data:
+            continue
+        try:
+            value, fresh_for = unwrap(decode(cached_data))
+        except Exception as e:
+            logger.error(f"Error decoding cached {key}: {e}")
+            continue
+        if fresh_for > 0:
+            local_cache.set(key, value, min(fresh_for, local_cache.ttl))
+        elif stale is not None:
+            stale.add(key)
+        if isinstance(value, Missing):
+            if missing is not None:
+                missing[key] = value.status
+        else:
+            found[key] = dict(value)
+    return found
+
+# ex is how long values stay fresh; Redis keeps them CACHE_STALE_TTL longer
+# so they can still be served while a refresh runs or SWAPI is down.
+async def set_objects(mapping: dict, ex: int = 60):
+    for key, value in mapping.items():
+        local_cache.set(key, dict(value), ex)
+    try:
+        await set_encoded({key: wrap(value, ex) for key, value in mapping.items()}, ex + settings.CACHE_STALE_TTL)
+    except Exception as e:
+        logger.error(f"Error writing cache: {e}")
+
+# Negative entries for keys SWAPI answered with 404 (or failed on); they
+# have no stale window and expire after a short TTL.
+async def set_missing(statuses: dict):
+    groups = {}
+    for key, status in statuses.items():
+        ttl = settings.NEGATIVE_CACHE_TTL if status == 404 else settings.NEGATIVE_ERROR_TTL
+        if ttl <= 0:
+            continue
+        local_cache.set(key, Missing(status), ttl)
+        groups.setdefault(ttl, {})[key] = encode({"data": None, "status": status, "fresh_until": time.time() + ttl})
+    try:
+        for ttl, group in groups.items():
+            await set_encoded(group, ttl)
+    except Exception as e:
+        logger.error(f"Error writing cache: {e}")
+
+POPULARITY_KEY = "popularity"
+
+popularity = Counter()
+
+def record_hits(keys):
+    if settings.POPULARITY_TRACKING:
+        popularity.update(keys)
+
+async def flush_popularity():
+    if not popularity:
+        return
+    counts = dict(popularity)
+    popularity.clear()
+    redis = await get_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, count in counts.items():
+            pipe.zincrby(POPULARITY_KEY, count, key)
+        pipe.zremrangebyrank(POPULARITY_KEY, 0, -settings.POPULARITY_MAX_KEYS - 1)
+        await pipe.execute()
+
+async def top_keys(limit: int) -> list[str]:
+    redis = await get_redis()
+    return await redis.zrevrange(POPULARITY_KEY, 0, limit - 1)
+
+async def remaining_freshness(keys: list[str]) -> dict:
+    remaining = {}
+    for key, cached_data in zip(keys, await get_encoded(keys)):
+        if cached_data:
+            value, fresh_for = unwrap(decode(cached_data))
+            remaining[key] = float("inf") if isinstance(value, Missing) else fresh_for
+    return remaining
@@ -6,13 +6,69 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "sW4p1*"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
     MONGO_URI: Optional[str] = None
     MONGO_DB: str = "starwars"
     MONGO_USERNAME: str = "admin"
     MONGO_PASSWORD: str = "admin123"
     MONGO_HOST: str = "localhost"
     MONGO_PORT: int = 27017
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: int = 60000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
     REDIS_URL: str = "redis://localhost:6379"
+    CACHE_TTL: int = 60 * 60 * 24
+    CACHE_STALE_TTL: int = 60 * 60 * 24 * 7
+    CACHE_CODEC: str = "orjson"
+    CACHE_COMPRESSION_MIN_SIZE: int = 1024
+    CACHE_ZSTD_LEVEL: int = 3
+    NEGATIVE_CACHE_TTL: int = 60 * 5
+    NEGATIVE_ERROR_TTL: int = 10
+    L1_CACHE_SIZE: int = 2048
+    L1_CACHE_TTL: int = 60 * 60 * 24
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: int = 60 * 5
+    RESPONSE_L1_CACHE_SIZE: int = 512
+    CACHE_CONTROL_DEFAULT: str = "public, max-age=300"
+    CACHE_CONTROL: dict[str, str] = {}
+    COMPRESSION_MIN_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5
+    EXPAND_CONCURRENCY: int = 20
+    EXPAND_MAX_DEPTH: int = 3
+    BATCH_MAX_ITEMS: int = 100
+    PAGE_MAX_SIZE: int = 100
+    EXPORT_CHUNK_SIZE: int = 50
+    UPSTREAM_HTTP2: bool = True
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_TIMEOUT: float = 10.0
+    UPSTREAM_CONNECT_TIMEOUT: float = 5.0
+    UPSTREAM_CONCURRENCY_INITIAL: int = 20
+    UPSTREAM_CONCURRENCY_MIN: int = 2
+    UPSTREAM_CONCURRENCY_MAX: int = 100
+    UPSTREAM_RETRIES: int = 2
+    UPSTREAM_RETRY_BACKOFF: float = 0.2
+    UPSTREAM_RETRY_BACKOFF_MAX: float = 2.0
+    REQUEST_DEADLINE: float = 8.0
+    UPSTREAM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    UPSTREAM_CIRCUIT_RESET_TIMEOUT: float = 30.0
+    MIRROR_ENABLED: bool = True
+    MIRROR_SYNC_ON_STARTUP: bool = True
+    MIRROR_REFRESH_INTERVAL: int = 60 * 60
+    WARMUP_ON_STARTUP: bool = False
+    WARMUP_CONCURRENCY: int = 10
+    POPULARITY_TRACKING: bool = False
+    POPULARITY_INTERVAL: int = 60
+    POPULARITY_TOP_KEYS: int = 100
+    POPULARITY_MAX_KEYS: int = 1000
+    POPULARITY_REFRESH_AHEAD: int = 60 * 60
+    UPSTREAM_DISTRIBUTED_LOCK: bool = False
+    UPSTREAM_LOCK_TTL_MS: int = 10000
+    UPSTREAM_LOCK_WAIT: float = 5.0
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 settings = Settings()
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+
+from pymongo import ASCENDING, AsyncMongoClient
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+mongo_client = None
+mongo_client_loop = None
+
+def create_mongo_client() -> AsyncMongoClient:
+    return AsyncMongoClient(
+        settings.MONGO_URI,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    )
+
+async def get_mongo_client() -> AsyncMongoClient:
+    global mongo_client, mongo_client_loop
+    loop = asyncio.get_running_loop()
+    if mongo_client is None or mongo_client_loop is not loop:
+        mongo_client = create_mongo_client()
+        mongo_client_loop = loop
+    return mongo_client
+
+async def close_mongo_client():
+    global mongo_client, mongo_client_loop
+    if mongo_client is not None:
+        await mongo_client.close()
+    mongo_client = None
+    mongo_client_loop = None
+
+async def get_database():
+    client = await get_mongo_client()
+    return client[settings.MONGO_DB]
+
+async def get_users_collection():
+    return (await get_database())["users"]
+
+async def get_favorites_collection():
+    return (await get_database())["favorites"]
+
+async def get_comments_collection():
+    return (await get_database())["comments"]
+
+async def get_comment_counts_collection():
+    return (await get_database())["comment_counts"]
+
+async def create_indexes():
+    try:
+        comments_collection = await get_comments_collection()
+        await comments_collection.create_index([("item_type", ASCENDING), ("item_id", ASCENDING), ("created", ASCENDING), ("_id", ASCENDING)])
+        await comments_collection.create_index([("user_id", ASCENDING), ("created", ASCENDING), ("_id", ASCENDING)])
+        favorites_collection = await get_favorites_collection()
+        await favorites_collection.create_index([("user_id", ASCENDING), ("type", ASCENDING), ("item_id", ASCENDING)], unique=True)
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}")
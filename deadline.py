@@ -0,0 +1,58 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+request_budget: ContextVar[Optional[dict]] = ContextVar("request_budget", default=None)
+
+class DeadlineExceeded(Exception):
+    pass
+
+def remaining_time() -> Optional[float]:
+    budget = request_budget.get()
+    if budget is None or budget["deadline"] is None:
+        return None
+    return budget["deadline"] - time.monotonic()
+
+def clear_deadline():
+    budget = request_budget.get()
+    if budget is not None:
+        budget["deadline"] = None
+
+def mark_partial():
+    budget = request_budget.get()
+    if budget is not None:
+        budget["partial"] = True
+
+def is_partial() -> bool:
+    budget = request_budget.get()
+    return budget is not None and budget["partial"]
+
+# Background work started from a request (mirror loads, stale refreshes)
+# runs in a copy of its context; this drops the request's budget there.
+async def detached(load):
+    request_budget.set(None)
+    return await load()
+
+class DeadlineMiddleware:
+    def __init__(self, app, budget: float):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # The budget dict is installed even without a deadline so partial
+        # responses are still marked and kept out of the response cache.
+        budget = {"deadline": time.monotonic() + self.budget if self.budget > 0 else None, "partial": False}
+        token = request_budget.set(budget)
+
+        async def send_with_marker(message):
+            if message["type"] == "http.response.start" and budget["partial"]:
+                message["headers"] = [*message.get("headers", []), (b"x-partial-response", b"true")]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_marker)
+        finally:
+            request_budget.reset(token)
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import urlencode
+
+import httpx
+from fastapi import HTTPException
+
+from cache import Missing, acquire_lock, get_objects, record_hits, release_lock, set_missing, set_objects
+from config import settings
+from deadline import DeadlineExceeded, detached, mark_partial, remaining_time
+from fieldsets import prune_tree
+from upstream import CircuitOpenError, fetch
+
+logger = logging.getLogger(__name__)
+
+RELATIONS = {
+    "films": {"characters": "people", "planets": "planets", "starships": "starships", "vehicles": "vehicles", "species": "species"},
+    "people": {"homeworld": "planets", "films": "films", "species": "species", "vehicles": "vehicles", "starships": "starships"},
+    "planets": {"residents": "people", "films": "films"},
+    "species": {"homeworld": "planets", "films": "films", "people": "people"},
+    "starships": {"films": "films", "pilots": "people"},
+    "vehicles": {"films": "films", "pilots": "people"},
+}
+
+def resource_key(resource: str, url: str) -> Optional[str]:
+    try:
+        data_id = int(url.rstrip('/').split('/')[-1])
+    except (AttributeError, ValueError):
+        return None
+    return f"{resource}/{data_id}"
+
+def as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return value
+
+async def fetch_upstream(key: str, client: httpx.AsyncClient) -> tuple[int, Optional[dict]]:
+    data_resp = await fetch(f"{settings.BASE_URL}{key}", client)
+    if data_resp.status_code != 200:
+        return data_resp.status_code, None
+    return 200, data_resp.json()
+
+refreshing = {}
+
+def _forget_refresh(key: str, task: asyncio.Task):
+    if refreshing.get(key) is task:
+        del refreshing[key]
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None and not isinstance(error, CircuitOpenError):
+        logger.error(f"Error refreshing {key}: {error}")
+
+def refresh_in_background(key: str, load):
+    task = refreshing.get(key)
+    if task is not None and task.get_loop() is asyncio.get_running_loop():
+        return
+    task = asyncio.ensure_future(detached(load))
+    refreshing[key] = task
+    task.add_done_callback(lambda done: _forget_refresh(key, done))
+
+async def refresh_resource(key: str, client: httpx.AsyncClient):
+    status, value = await fetch_upstream(key, client)
+    if value is not None:
+        await set_objects({key: value}, settings.CACHE_TTL)
+    elif status == 404:
+        await set_missing({key: 404})
+
+async def wait_for_cache(key: str):
+    wait = settings.UPSTREAM_LOCK_WAIT
+    remaining = remaining_time()
+    if remaining is not None:
+        wait = min(wait, remaining)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while loop.time() < deadline:
+        await asyncio.sleep(min(0.05, max(deadline - loop.time(), 0)))
+        missing = {}
+        found = await get_objects([key], missing=missing)
+        if key in found:
+            return found[key]
+        if key in missing:
+            return Missing(missing[key])
+    if remaining is not None and remaining <= wait:
+        raise DeadlineExceeded(f"Request deadline passed while waiting for {key}")
+    return None
+
+async def fetch_resource(key: str, client: httpx.AsyncClient) -> Optional[dict]:
+    failures = {}
+    resolved = await fetch_resources([key], client, failures)
+    status = failures.get(key, 404)
+    if status == 504:
+        raise HTTPException(status_code=504, detail=f"Timed out fetching {key} from SWAPI")
+    if status != 404:
+        raise HTTPException(status_code=502, detail=f"Could not fetch {key} from SWAPI")
+    return resolved.get(key)
+
+# failures, when given, receives the status (404, 502 for upstream errors,
+# 504 when the request ran out of time) of every key that could not be
+# resolved.
+async def fetch_resources(keys, client: httpx.AsyncClient, failures: Optional[dict] = None) -> dict:
+    keys = list(set(keys))
+    record_hits(keys)
+    stale = set()
+    missing = {}
+    resolved = await get_objects(keys, stale, missing)
+    # Stale entries are served as they are while SWAPI is asked again.
+    for key in stale:
+        refresh_in_background(key, lambda key=key: refresh_resource(key, client))
+
+    semaphore = asyncio.Semaphore(settings.EXPAND_CONCURRENCY)
+    locks = {}
+
+    async def fetch_one(key: str):
+        async with semaphore:
+            try:
+                if settings.UPSTREAM_DISTRIBUTED_LOCK:
+                    token = await acquire_lock(key, settings.UPSTREAM_LOCK_TTL_MS)
+                    if token is None:
+                        value = await wait_for_cache(key)
+                        if isinstance(value, Missing):
+                            return key, value.status, None
+                        if value is not None:
+                            return key, 200, value
+                    else:
+                        locks[key] = token
+                status, value = await fetch_upstream(key, client)
+                return key, status, value
+            except DeadlineExceeded:
+                return key, 504, None
+            except Exception as e:
+                logger.error(f"Error fetching {key}: {e}")
+                return key, 502, None
+
+    results = await asyncio.gather(*(fetch_one(key) for key in keys if key not in resolved and key not in missing))
+    fetched = {key: value for key, status, value in results if value is not None}
+    failed = {key: status if status in (404, 504) else 502 for key, status, value in results if value is None}
+    await set_objects(fetched, settings.CACHE_TTL)
+    # A timeout only means this request gave up; the shared fetch may still
+    # land in the cache, so it is not remembered as a miss.
+    await set_missing({key: status for key, status in failed.items() if status != 504})
+    # Errors remembered by the negative cache leave the same holes as fresh
+    # ones, so they make the response partial too.
+    if any(status != 404 for status in [*missing.values(), *failed.values()]):
+        mark_partial()
+    # Locks are released only once the values are in Redis, so waiting
+    # workers find them instead of going upstream themselves.
+    for key, token in locks.items():
+        try:
+            await release_lock(key, token)
+        except Exception as e:
+            logger.error(f"Error releasing lock for {key}: {e}")
+    resolved.update(fetched)
+    if failures is not None:
+        failures.update(missing)
+        failures.update(failed)
+    return resolved
+
+def listing_key(resource: str, search: Optional[str]) -> str:
+    search = (search or "").strip().lower()
+    if not search:
+        return resource
+    return f"{resource}?{urlencode({'search': search})}"
+
+def copy_listing(data: dict) -> dict:
+    return {**data, "results": [dict(item) for item in data.get("results") or []]}
+
+async def load_listing(resource: str, search: Optional[str], client: httpx.AsyncClient) -> Optional[dict]:
+    key = listing_key(resource, search)
+    data_resp = await fetch(f"{settings.BASE_URL}{key}", client)
+    if data_resp.status_code != 200:
+        return None
+    data = data_resp.json()
+    entities = {}
+    for item in data.get("results") or []:
+        item_key = resource_key(resource, item.get("url"))
+        if item_key:
+            entities[item_key] = item
+    await set_objects({key: data, **entities}, settings.CACHE_TTL)
+    return data
+
+async def fetch_listing(resource: str, search: Optional[str], client: httpx.AsyncClient) -> Optional[dict]:
+    key = listing_key(resource, search)
+    stale = set()
+    found = await get_objects([key], stale)
+    if key in found:
+        if stale:
+            refresh_in_background(key, lambda: load_listing(resource, search, client))
+        return copy_listing(found[key])
+    try:
+        data = await load_listing(resource, search, client)
+    except Exception as e:
+        logger.error(f"Error fetching {key}: {e}")
+        return None
+    if data is None:
+        return None
+    return copy_listing(data)
+
+def expansion_tree(resource: str, fields: list[str], expand: Optional[str] = None, fieldsets: Optional[dict] = None) -> dict:
+    tree = {field: {} for field in fields}
+    for path in (expand or "").split(","):
+        path = path.strip()
+        if not path:
+            continue
+        parts = path.split(".")
+        if len(parts) > settings.EXPAND_MAX_DEPTH:
+            raise HTTPException(status_code=400, detail=f"Expansion '{path}' is deeper than {settings.EXPAND_MAX_DEPTH} levels")
+        node = tree
+        current = resource
+        for part in parts:
+            target = RELATIONS[current].get(part)
+            if target is None:
+                raise HTTPException(status_code=400, detail=f"Cannot expand '{part}' on {current}")
+            node = node.setdefault(part, {})
+            current = target
+    return prune_tree(tree, fieldsets)
+
+async def expand_relations(resource: str, data: dict, tree: dict, client: httpx.AsyncClient, resolved: Optional[dict] = None) -> dict:
+    if not tree:
+        return data
+    if "results" in data:
+        items = data["results"] or []
+    else:
+        items = [data]
+    await expand_many([(item, resource, tree) for item in items], client, resolved)
+    return data
+
+async def expand_many(frontier: list[tuple], client: httpx.AsyncClient, resolved: Optional[dict] = None):
+    # Entities fetched for this request, shared by every level (and by every
+    # item of a batch when the caller passes its own dict).
+    if resolved is None:
+        resolved = {}
+
+    while frontier:
+        keys = set()
+        for item, current, node in frontier:
+            for field in node:
+                for url in as_list(item.get(field)):
+                    key = resource_key(RELATIONS[current][field], url)
+                    if key and key not in resolved:
+                        keys.add(key)
+        resolved.update(await fetch_resources(keys, client))
+
+        next_frontier = []
+        for item, current, node in frontier:
+            for field, children in node.items():
+                target = RELATIONS[current][field]
+
+                def resolve(url):
+                    entity = resolved.get(resource_key(target, url)) if isinstance(url, str) else None
+                    if entity is None:
+                        return url
+                    entity = dict(entity)
+                    if children:
+                        next_frontier.append((entity, target, children))
+                    return entity
+
+                value = item.get(field)
+                if isinstance(value, list):
+                    item[field] = [resolve(url) for url in value]
+                elif isinstance(value, str):
+                    item[field] = resolve(value)
+        frontier = next_frontier
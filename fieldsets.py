@@ -0,0 +1,55 @@
+from typing import Optional
+
+from fastapi import Request
+
+def parse_fieldsets(request: Request) -> dict[str, set[str]]:
+    fieldsets = {}
+    for key, value in request.query_params.multi_items():
+        if key == "fields":
+            path = ""
+        elif key.startswith("fields[") and key.endswith("]"):
+            path = key[len("fields["):-1].strip()
+        else:
+            continue
+        fieldsets.setdefault(path, set()).update(field.strip() for field in value.split(",") if field.strip())
+    return fieldsets
+
+def prune_tree(tree: dict, fieldsets: Optional[dict], path: str = "") -> dict:
+    if not fieldsets:
+        return tree
+    selected = fieldsets.get(path)
+    pruned = {}
+    for field, children in tree.items():
+        if selected is not None and field not in selected:
+            continue
+        pruned[field] = prune_tree(children, fieldsets, f"{path}.{field}" if path else field)
+    return pruned
+
+def select_fields(item: dict, fieldsets: dict, path: str = "") -> dict:
+    selected = fieldsets.get(path)
+    result = {}
+    for field, value in item.items():
+        if selected is not None and field not in selected:
+            continue
+        child_path = f"{path}.{field}" if path else field
+        if isinstance(value, dict):
+            value = select_fields(value, fieldsets, child_path)
+        elif isinstance(value, list):
+            value = [select_fields(entry, fieldsets, child_path) if isinstance(entry, dict) else entry for entry in value]
+        result[field] = value
+    return result
+
+def apply_fieldsets(data: dict, fieldsets: Optional[dict]) -> dict:
+    if not fieldsets:
+        return data
+    if "results" in data:
+        return {**data, "results": [select_fields(item, fieldsets) for item in data["results"] or []]}
+    return select_fields(data, fieldsets)
+
+def fieldsets_from_paths(paths: Optional[list[str]]) -> dict[str, set[str]]:
+    fieldsets = {}
+    for path in paths or []:
+        parts = [part.strip() for part in path.split(".") if part.strip()]
+        for depth, field in enumerate(parts):
+            fieldsets.setdefault(".".join(parts[:depth]), set()).add(field)
+    return fieldsets
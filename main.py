@@ -1,12 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
-from routers import auth, films, people, planets, species, starships, vehicles, favorites, comments
+from fastapi.middleware.gzip import GZipMiddleware
+from config import settings
+from deadline import DeadlineMiddleware
+from database import close_mongo_client, create_indexes, get_mongo_client
+from mirror import run_sync_loop
+from upstream import get_http_client, close_http_client
+from warmup import run_popularity_loop, warm_up
+from routers import auth, batch, export, films, people, planets, species, starships, vehicles, favorites, comments
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    client = await get_http_client()
+    await get_mongo_client()
+    await create_indexes()
+    tasks = []
+    if settings.MIRROR_ENABLED:
+        tasks.append(asyncio.create_task(run_sync_loop(client)))
+    if settings.WARMUP_ON_STARTUP:
+        tasks.append(asyncio.create_task(warm_up(client)))
+    if settings.POPULARITY_TRACKING:
+        tasks.append(asyncio.create_task(run_popularity_loop(client)))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await close_http_client()
+    await close_mongo_client()
 
 app = FastAPI(
     title="Star Wars API",
     description="API utilizando o swapi para teste técnico",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE, compresslevel=settings.GZIP_COMPRESS_LEVEL)
+app.add_middleware(DeadlineMiddleware, budget=settings.REQUEST_DEADLINE)
+
 
 app.include_router(auth.router)
 app.include_router(films.router)
@@ -16,4 +49,6 @@ app.include_router(species.router)
 app.include_router(starships.router)
 app.include_router(vehicles.router)
 app.include_router(favorites.router)
-app.include_router(comments.router)
\ No newline at end of file
+app.include_router(comments.router)
+app.include_router(batch.router)
+app.include_router(export.router)
\ No newline at end of file
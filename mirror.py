@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import httpx
+from fastapi import Request
+
+from cache import set_objects
+from config import settings
+from deadline import detached, mark_partial, remaining_time
+from expansion import fetch_listing, resource_key
+from search_index import ResourceIndex
+from upstream import fetch
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = ("films", "people", "planets", "species", "starships", "vehicles")
+
+catalogues = {}
+indexes = {}
+synced_at = {}
+loading = {}
+
+async def fetch_page(resource: str, page: int, client: httpx.AsyncClient) -> dict:
+    response = await fetch(f"{settings.BASE_URL}{resource}/?page={page}", client)
+    if response.status_code != 200:
+        raise RuntimeError(f"SWAPI returned {response.status_code} for {resource} page {page}")
+    return response.json()
+
+async def crawl(resource: str, client: httpx.AsyncClient, concurrency: Optional[int] = None, on_page=None) -> list[dict]:
+    first = await fetch_page(resource, 1, client)
+    results = list(first.get("results") or [])
+    page_size = len(results) or 1
+    pages = -(-(first.get("count") or 0) // page_size)
+    if on_page:
+        await on_page(1, pages, first)
+    semaphore = asyncio.Semaphore(concurrency or settings.EXPAND_CONCURRENCY)
+
+    async def fetch_one(page: int):
+        async with semaphore:
+            data = await fetch_page(resource, page, client)
+        if on_page:
+            await on_page(page, pages, data)
+        return data
+
+    for data in await asyncio.gather(*(fetch_one(page) for page in range(2, pages + 1))):
+        results.extend(data.get("results") or [])
+    return results
+
+async def sync_resource(resource: str, client: httpx.AsyncClient) -> int:
+    started = time.monotonic()
+    items = {}
+    for item in await crawl(resource, client):
+        key = resource_key(resource, item.get("url"))
+        if key:
+            items[key] = item
+    previous = catalogues.get(resource, {})
+    changed = [key for key, item in items.items() if previous.get(key, {}).get("edited") != item.get("edited")]
+    removed = len(previous.keys() - items.keys())
+    # Every entity is rewritten so unchanged ones keep their Redis TTL alive.
+    await set_objects(items, settings.CACHE_TTL)
+    if changed or removed or resource not in catalogues:
+        catalogues[resource] = dict(sorted(items.items(), key=lambda entry: int(entry[0].split("/")[1])))
+        indexes[resource] = ResourceIndex(resource, list(catalogues[resource].values()))
+    synced_at[resource] = time.time()
+    logger.info(f"Mirror synced {resource}: {len(items)} items, {len(changed)} changed, {removed} removed in {time.monotonic() - started:.2f}s")
+    return len(changed)
+
+async def sync_all(client: httpx.AsyncClient):
+    results = await asyncio.gather(*(sync_resource(resource, client) for resource in RESOURCES), return_exceptions=True)
+    for resource, result in zip(RESOURCES, results):
+        if isinstance(result, Exception):
+            logger.error(f"Mirror sync failed for {resource}: {result}")
+
+async def run_sync_loop(client: httpx.AsyncClient):
+    if settings.MIRROR_SYNC_ON_STARTUP:
+        await sync_all(client)
+    while settings.MIRROR_REFRESH_INTERVAL > 0:
+        await asyncio.sleep(settings.MIRROR_REFRESH_INTERVAL)
+        await sync_all(client)
+
+def _forget(resource: str, task: asyncio.Task):
+    if loading.get(resource) is task:
+        del loading[resource]
+    if not task.cancelled():
+        task.exception()
+
+async def get_index(resource: str, client: httpx.AsyncClient) -> Optional[ResourceIndex]:
+    if not settings.MIRROR_ENABLED:
+        return None
+    if resource not in indexes:
+        task = loading.get(resource)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(detached(lambda: sync_resource(resource, client)))
+            loading[resource] = task
+            task.add_done_callback(lambda done: _forget(resource, done))
+        # Wait at most half of the request budget so the upstream listing
+        # still fits in the rest; the crawl keeps going in the background.
+        # That listing only covers the first SWAPI page, so the response is
+        # marked partial and kept out of the response cache.
+        remaining = remaining_time()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), None if remaining is None else remaining / 2)
+        except asyncio.TimeoutError:
+            logger.info(f"Mirror for {resource} is still loading, serving from SWAPI")
+            mark_partial()
+            return None
+        except Exception as e:
+            logger.error(f"Mirror load failed for {resource}: {e}")
+            mark_partial()
+            return None
+    return indexes[resource]
+
+def page_url(request: Optional[Request], page: int) -> Optional[str]:
+    if request is None:
+        return None
+    return str(request.url.include_query_params(page=page))
+
+async def list_page(resource: str, search: Optional[str], n: int, page: int, order_by: Optional[str], order_direction: str, request: Optional[Request], client: httpx.AsyncClient) -> Optional[dict]:
+    start_idx = (page - 1) * n
+    end_idx = page * n
+    index = await get_index(resource, client)
+    if index is None:
+        listing = await fetch_listing(resource, search, client)
+        if listing is None:
+            return None
+        index = ResourceIndex(resource, listing["results"])
+        search = None
+    total, results = index.query(search, order_by, order_direction == "desc", max(start_idx, 0), max(end_idx, 0))
+    return {
+        "count": total,
+        "next": page_url(request, page + 1) if end_idx < total else None,
+        "previous": page_url(request, page - 1) if page > 1 else None,
+        "results": [dict(item) for item in results],
+    }
@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import logging
+from typing import Optional
+from urllib.parse import urlencode
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from cache import LRUCache, get_binary_redis, record_hits
+from config import settings
+from deadline import is_partial
+from expansion import resource_key
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+local_responses = LRUCache(settings.RESPONSE_L1_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+def response_key(request: Request) -> str:
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"resp:{request.url.netloc}{request.url.path}?{query}"
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag in (etag, variant_etag(etag, "gzip"), variant_etag(etag, "br")):
+            return True
+    return False
+
+def compress_body(body: bytes) -> dict:
+    variants = {}
+    if len(body) < settings.COMPRESSION_MIN_SIZE:
+        return variants
+    variants["gzip"] = gzip.compress(body, compresslevel=settings.GZIP_COMPRESS_LEVEL, mtime=0)
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    return variants
+
+def make_entry(body: bytes, etag: Optional[str] = None, keys: str = "") -> dict:
+    variants = compress_body(body)
+    return {"body": body, "etag": etag or make_etag(body), "encodings": ",".join(variants), "keys": keys, **variants}
+
+def embedded_keys(data, keys: dict):
+    if isinstance(data, dict):
+        url = data.get("url")
+        parts = url.rstrip("/").split("/") if isinstance(url, str) else []
+        key = resource_key(parts[-2], url) if len(parts) >= 2 else None
+        if key:
+            keys[key] = None
+        for value in data.values():
+            embedded_keys(value, keys)
+    elif isinstance(data, list):
+        for value in data:
+            embedded_keys(value, keys)
+
+def expanded_keys(data: dict) -> dict:
+    # Relations expanded inside the response's entities, which went through
+    # fetch_resources on the miss. The entities themselves are left out:
+    # listings come from the mirror without counting their items, and detail
+    # routes add their key from the path, so hits count what the miss did.
+    entities = data["results"] if isinstance(data.get("results"), list) else [data]
+    keys = {}
+    for entity in entities:
+        if isinstance(entity, dict):
+            for value in entity.values():
+                embedded_keys(value, keys)
+    return keys
+
+def record_entry_hits(keys: str):
+    if keys:
+        record_hits(keys.split(","))
+
+def negotiate_encoding(request: Request, encodings: str) -> Optional[str]:
+    accepted = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding.strip():
+            accepted[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in ("br", "gzip"):
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in encodings.split(",") and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def cache_headers(resource: str, etag: str) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": settings.CACHE_CONTROL.get(resource, settings.CACHE_CONTROL_DEFAULT),
+        "Vary": "Accept-Encoding",
+    }
+
+def build_response(request: Request, resource: str, entry: dict) -> Response:
+    encoding = negotiate_encoding(request, entry["encodings"])
+    headers = cache_headers(resource, variant_etag(entry["etag"], encoding))
+    if etag_matches(request, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(content=entry["body"], media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=entry[encoding], media_type="application/json", headers=headers)
+
+async def get_cached_response(request: Request, resource: str) -> Optional[Response]:
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    key = response_key(request)
+    entry = local_responses.get(key)
+    if entry is None:
+        try:
+            redis = await get_binary_redis()
+            if request.headers.get("if-none-match"):
+                etag, encodings, keys = await redis.hmget(key, ["etag", "encodings", "keys"])
+                if etag is not None and etag_matches(request, etag.decode()):
+                    record_entry_hits((keys or b"").decode())
+                    encoding = negotiate_encoding(request, (encodings or b"").decode())
+                    return Response(status_code=304, headers=cache_headers(resource, variant_etag(etag.decode(), encoding)))
+            stored = {field.decode(): value for field, value in (await redis.hgetall(key)).items()}
+        except Exception as e:
+            logger.error(f"Error reading response cache: {e}")
+            return None
+        if "body" not in stored:
+            return None
+        if "encodings" in stored:
+            entry = {**stored, "etag": stored["etag"].decode(), "encodings": stored["encodings"].decode(), "keys": stored.get("keys", b"").decode()}
+        else:
+            entry = make_entry(stored["body"], stored["etag"].decode() if "etag" in stored else None)
+        local_responses.set(key, entry)
+    record_entry_hits(entry.get("keys", ""))
+    return build_response(request, resource, entry)
+
+async def cache_response(request: Request, resource: str, content: BaseModel) -> Response:
+    data = content.model_dump(exclude_unset=True)
+    keys = expanded_keys(data)
+    for value in request.path_params.values():
+        key = resource_key(resource, str(value))
+        if key:
+            keys[key] = None
+    entry = make_entry(ORJSONResponse(data).body, keys=",".join(keys))
+    # Responses missing relations because SWAPI failed or time ran out are
+    # served once but not kept.
+    if settings.RESPONSE_CACHE_ENABLED and not is_partial():
+        key = response_key(request)
+        local_responses.set(key, entry)
+        try:
+            redis = await get_binary_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=entry)
+                pipe.expire(key, settings.RESPONSE_CACHE_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error writing response cache: {e}")
+    return build_response(request, resource, entry)
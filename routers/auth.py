@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from strategy import hash_password, verify_password, create_access_token
+from strategy import hash_password_async, verify_password_async, create_access_token
 from jose import JWTError, jwt
 from config import settings
-from pymongo import MongoClient
+from database import get_users_collection
 from bson import ObjectId
 from pydantic import BaseModel, Field
 
@@ -19,28 +19,24 @@ router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-client = MongoClient(settings.MONGO_URI)
-db = client[settings.MONGO_DB]
-users_collection = db["users"]
-
 class User(BaseModel):
     username: str
     password: str
 
 @router.post("/register", tags=["auth"], description="Register a new user", summary="Register a new user")
-async def register(user: User):
-    hashed_password = hash_password(user.password)
-    user_db = users_collection.find_one({"username": user.username})
+async def register(user: User, users_collection = Depends(get_users_collection)):
+    user_db = await users_collection.find_one({"username": user.username})
     if user_db:
         raise HTTPException(status_code=400, detail="User already exists")
-    result = users_collection.insert_one({"username": user.username, "hashed_password": hashed_password})
+    hashed_password = await hash_password_async(user.password)
+    result = await users_collection.insert_one({"username": user.username, "hashed_password": hashed_password})
 
     return {"message": "User registered successfully"}
 
 @router.post("/token", tags=["auth"], description="Login a user", summary="Login a user")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user_db = users_collection.find_one({"username": form_data.username})
-    if not user_db or not verify_password(form_data.password, user_db["hashed_password"]):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), users_collection = Depends(get_users_collection)):
+    user_db = await users_collection.find_one({"username": form_data.username})
+    if not user_db or not await verify_password_async(form_data.password, user_db["hashed_password"]):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     access_token = create_access_token(data={"sub": user_db["username"], "id": str(user_db["_id"])})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -58,6 +54,6 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 
 
 @router.delete("/user", tags=["auth"], description="Delete a user", summary="Delete a user")
-async def delete_user(current_user: dict = Depends(get_current_user)):
-    users_collection.delete_one({"_id": ObjectId(current_user["id"])})
+async def delete_user(current_user: dict = Depends(get_current_user), users_collection = Depends(get_users_collection)):
+    await users_collection.delete_one({"_id": ObjectId(current_user["id"])})
     return {"message": "User deleted successfully"}
\ No newline at end of file
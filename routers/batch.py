@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+import httpx
+
+from config import settings
+from expansion import RELATIONS, expand_many, expansion_tree, fetch_resources
+from fieldsets import apply_fieldsets, fieldsets_from_paths
+from upstream import get_http_client
+
+router = APIRouter()
+
+class batch_item(BaseModel):
+    resource: str
+    id: int
+    expand: Optional[str] = None
+    fields: Optional[list[str]] = None
+
+class batch_result(BaseModel):
+    resource: str
+    id: int
+    status: int
+    data: Optional[dict] = None
+    detail: Optional[str] = None
+
+@router.post("/batch", tags=["batch"], description="Fetch many resources, with per-item expand and fields, in one request", summary="Fetch many resources", response_model_exclude_none=True)
+async def batch(items: list[batch_item], client: httpx.AsyncClient = Depends(get_http_client)) -> list[batch_result]:
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch accepts at most {settings.BATCH_MAX_ITEMS} items")
+    errors = {}
+    plans = {}
+    for index, item in enumerate(items):
+        if item.resource not in RELATIONS:
+            errors[index] = (404, f"Unknown resource '{item.resource}'")
+            continue
+        fieldsets = fieldsets_from_paths(item.fields)
+        try:
+            plans[index] = (expansion_tree(item.resource, [], item.expand, fieldsets), fieldsets)
+        except HTTPException as e:
+            errors[index] = (e.status_code, e.detail)
+
+    # Roots and relations of every item go through one shared memo, so an
+    # entity requested by several items (or reached from several) is read once.
+    failures = {}
+    resolved = await fetch_resources([f"{items[index].resource}/{items[index].id}" for index in plans], client, failures)
+    found = {}
+    for index in plans:
+        key = f"{items[index].resource}/{items[index].id}"
+        entity = resolved.get(key)
+        if entity is None and failures.get(key) == 504:
+            errors[index] = (504, f"Timed out fetching {key} from SWAPI")
+        elif entity is None and failures.get(key, 404) != 404:
+            errors[index] = (502, f"Could not fetch {key} from SWAPI")
+        elif entity is None:
+            errors[index] = (404, f"{key} not found")
+        else:
+            found[index] = dict(entity)
+    await expand_many([(found[index], items[index].resource, plans[index][0]) for index in found], client, resolved)
+
+    results = []
+    for index, item in enumerate(items):
+        if index in found:
+            results.append(batch_result(resource=item.resource, id=item.id, status=200, data=apply_fieldsets(found[index], plans[index][1])))
+        else:
+            status, detail = errors[index]
+            results.append(batch_result(resource=item.resource, id=item.id, status=status, detail=detail))
+    return results
@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 from typing import Optional
 from config import settings
-from pymongo import MongoClient
+from database import get_comment_counts_collection, get_comments_collection
+from cache import get_many, set_versioned_many, split_versioned
 from .auth import get_current_user
 from datetime import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+import base64
+import json
+import logging
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
-client = MongoClient(settings.MONGO_URI)
-db = client[settings.MONGO_DB]
-comments_collection = db["comments"]
-
 
 class comment(BaseModel):
     content: str = Field(default=None)
@@ -32,6 +35,16 @@ class comments_response(BaseModel):
     total: int
     page: int
     limit: int
+    next_cursor: Optional[str] = None
+
+class comment_target(BaseModel):
+    item_type: str
+    item_id: str
+
+class comment_count(BaseModel):
+    item_type: str
+    item_id: str
+    count: int
 
 def convert_objectid_to_str(doc):
     if doc is None:
@@ -50,45 +63,141 @@ def convert_objectid_to_str(doc):
         return result
     return doc
 
+SORTABLE_FIELDS = {"created"}
+
+def item_counter(item_type: str, item_id: str) -> tuple[str, dict]:
+    return f"item:{item_type}:{item_id}", {"item_type": item_type, "item_id": item_id}
+
+def user_counter(user_id: str) -> tuple[str, dict]:
+    return f"user:{user_id}", {"user_id": ObjectId(user_id)}
+
+# Counters carry a version bumped with every $inc; Redis only keeps the
+# newest one, so a count read before a concurrent write cannot replace it.
+async def cache_counts(counts: dict):
+    try:
+        await set_versioned_many({f"comments:count:{key}": (version, str(count)) for key, (version, count) in counts.items()}, settings.CACHE_TTL)
+    except Exception as e:
+        logger.error(f"Error caching comment counts: {e}")
+
+async def get_counts(counts_collection, comments_collection, counters: dict) -> dict:
+    keys = list(counters)
+    counts = {}
+    try:
+        for key, value in zip(keys, await get_many([f"comments:count:{key}" for key in keys])):
+            if value is not None:
+                counts[key] = int(split_versioned(value)[1])
+    except Exception as e:
+        logger.error(f"Error reading comment counts: {e}")
+    missing = [key for key in keys if key not in counts]
+    if not missing:
+        return counts
+    stored = {}
+    async for doc in counts_collection.find({"_id": {"$in": missing}}):
+        stored[doc["_id"]] = (doc.get("version", 0), doc["count"])
+    for key in missing:
+        if key not in stored:
+            # First time this counter is needed: seed it from the comments themselves.
+            # Empty items are not persisted; seed_counts creates them before the first comment.
+            count = await comments_collection.count_documents(counters[key])
+            version = 0
+            if count:
+                doc = await counts_collection.find_one_and_update({"_id": key}, {"$setOnInsert": {"count": count, "version": 0}}, upsert=True, return_document=ReturnDocument.AFTER)
+                version, count = doc.get("version", 0), doc["count"]
+            stored[key] = (version, count)
+    await cache_counts(stored)
+    counts.update({key: count for key, (_, count) in stored.items()})
+    return counts
+
+async def seed_counts(counts_collection, comments_collection, counters: dict):
+    # Runs before the comment is written, so the seed never includes the
+    # comment that bump_counts is about to count.
+    existing = {doc["_id"] async for doc in counts_collection.find({"_id": {"$in": list(counters)}})}
+    for key, query in counters.items():
+        if key not in existing:
+            count = await comments_collection.count_documents(query)
+            await counts_collection.update_one({"_id": key}, {"$setOnInsert": {"count": count, "version": 0}}, upsert=True)
+
+async def bump_counts(counts_collection, counters: dict, delta: int):
+    counts = {}
+    for key in counters:
+        doc = await counts_collection.find_one_and_update({"_id": key}, {"$inc": {"count": delta, "version": 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+        counts[key] = (doc["version"], doc["count"])
+    await cache_counts(counts)
+
+def encode_cursor(doc: dict, order_by: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([doc.get(order_by), str(doc["_id"])]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        value, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, ObjectId(doc_id)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def find_comments(comments_collection, counts_collection, counter: tuple[str, dict], page: int, limit: int, order_by: str, order_direction: str, after: Optional[str]) -> comments_response:
+    if order_by not in SORTABLE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"order_by must be one of: {', '.join(sorted(SORTABLE_FIELDS))}")
+    direction = DESCENDING if order_direction == "desc" else ASCENDING
+    key, query = counter
+    total = (await get_counts(counts_collection, comments_collection, {key: query}))[key]
+    if after:
+        value, doc_id = decode_cursor(after)
+        operator = "$lt" if direction == DESCENDING else "$gt"
+        query = {**query, "$or": [{order_by: {operator: value}}, {order_by: value, "_id": {operator: doc_id}}]}
+    cursor = comments_collection.find(query).sort([(order_by, direction), ("_id", direction)])
+    if not after:
+        cursor = cursor.skip((page - 1) * limit)
+    comments = await cursor.limit(limit + 1).to_list()
+    next_cursor = encode_cursor(comments[limit - 1], order_by) if len(comments) > limit else None
+    return comments_response(comments=[convert_objectid_to_str(comment) for comment in comments[:limit]], total=total, page=page, limit=limit, next_cursor=next_cursor)
+
 @router.post("/comments", tags=["comments"], description="Add a comment", summary="Add a comment")
-async def add_comment(comment: comment, current_user: dict = Depends(get_current_user)):
-    comments_collection.insert_one({**comment.model_dump(), "created": datetime.now().isoformat(), "updated": None, "user_id": ObjectId(current_user["id"])})
+async def add_comment(comment: comment, current_user: dict = Depends(get_current_user), comments_collection = Depends(get_comments_collection), counts_collection = Depends(get_comment_counts_collection)):
+    counters = dict([item_counter(comment.item_type, comment.item_id), user_counter(current_user["id"])])
+    await seed_counts(counts_collection, comments_collection, counters)
+    await comments_collection.insert_one({**comment.model_dump(), "created": datetime.now().isoformat(), "updated": None, "user_id": ObjectId(current_user["id"])})
+    await bump_counts(counts_collection, counters, 1)
     return {"message": "Comment added successfully"}
 
 @router.get("/comments", tags=["comments"], description="Get all comments", summary="Get all comments")
-async def get_comments(item_id: str, item_type: str, page: int = 1, limit: int = 10, order_by: str = "created", order_direction: str = "asc") -> comments_response:
-    comments = comments_collection.find({"item_id": item_id, "item_type": item_type}).skip((page - 1) * limit).limit(limit)
-    if order_by:
-        comments = sorted(comments, key=lambda x: getattr(x, order_by, ""), reverse=order_direction == "desc")
-    return comments_response(comments=[convert_objectid_to_str(comment) for comment in comments], total=comments_collection.count_documents({"item_id": item_id, "item_type": item_type}), page=page, limit=limit)
+async def get_comments(item_id: str, item_type: str, page: int = Query(1, ge=1), limit: int = Query(10, ge=1), order_by: str = "created", order_direction: str = "asc", after: Optional[str] = None, comments_collection = Depends(get_comments_collection), counts_collection = Depends(get_comment_counts_collection)) -> comments_response:
+    return await find_comments(comments_collection, counts_collection, item_counter(item_type, item_id), page, limit, order_by, order_direction, after)
+
+@router.post("/comments/counts", tags=["comments"], description="Get comment counts for many items in one call", summary="Get comment counts")
+async def get_comment_counts(targets: list[comment_target], comments_collection = Depends(get_comments_collection), counts_collection = Depends(get_comment_counts_collection)) -> list[comment_count]:
+    counters = dict(item_counter(target.item_type, target.item_id) for target in targets)
+    counts = await get_counts(counts_collection, comments_collection, counters)
+    return [comment_count(item_type=target.item_type, item_id=target.item_id, count=counts[item_counter(target.item_type, target.item_id)[0]]) for target in targets]
 
 @router.get("/comments/{comment_id}", tags=["comments"], description="Get a comment by ID", summary="Get a comment by ID")
-async def get_comment(comment_id: str):
-    comment_doc = comments_collection.find_one({"_id": ObjectId(comment_id)})
+async def get_comment(comment_id: str, comments_collection = Depends(get_comments_collection)):
+    comment_doc = await comments_collection.find_one({"_id": ObjectId(comment_id)})
     if not comment_doc:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Comment not found")
     return convert_objectid_to_str(comment_doc)
 
 @router.get("/comments/user/{user_id}", tags=["comments"], description="Get all comments by user ID", summary="Get all comments by user ID")
-async def get_comments_by_user(user_id: str, page: int = 1, limit: int = 10, order_by: str = "created", order_direction: str = "asc") -> comments_response:
-    comments = comments_collection.find({"user_id": ObjectId(user_id)}).skip((page - 1) * limit).limit(limit)
-    if order_by:
-        comments = sorted(comments, key=lambda x: getattr(x, order_by, ""), reverse=order_direction == "desc")
-    return comments_response(comments=[convert_objectid_to_str(comment) for comment in comments], total=comments_collection.count_documents({"user_id": ObjectId(user_id)}), page=page, limit=limit)
+async def get_comments_by_user(user_id: str, page: int = Query(1, ge=1), limit: int = Query(10, ge=1), order_by: str = "created", order_direction: str = "asc", after: Optional[str] = None, comments_collection = Depends(get_comments_collection), counts_collection = Depends(get_comment_counts_collection)) -> comments_response:
+    return await find_comments(comments_collection, counts_collection, user_counter(user_id), page, limit, order_by, order_direction, after)
 
 @router.put("/comments/{comment_id}", tags=["comments"], description="Update a comment", summary="Update a comment")
-async def update_comment(comment_id: str, comment: comment_update, current_user: dict = Depends(get_current_user)):
-    result = comments_collection.update_one({"_id": ObjectId(comment_id), "user_id": ObjectId(current_user["id"])}, {"$set": {**comment.model_dump(), "updated": datetime.now().isoformat()}})
+async def update_comment(comment_id: str, comment: comment_update, current_user: dict = Depends(get_current_user), comments_collection = Depends(get_comments_collection)):
+    result = await comments_collection.update_one({"_id": ObjectId(comment_id), "user_id": ObjectId(current_user["id"])}, {"$set": {**comment.model_dump(), "updated": datetime.now().isoformat()}})
     if result.matched_count == 0:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Comment not found or you don't have permission to update it")
     return {"message": "Comment updated successfully"}
 
 @router.delete("/comments/{comment_id}", tags=["comments"], description="Delete a comment", summary="Delete a comment")
-async def delete_comment(comment_id: str, current_user: dict = Depends(get_current_user)):
-    result = comments_collection.delete_one({"_id": ObjectId(comment_id), "user_id": ObjectId(current_user["id"])})
-    if result.deleted_count == 0:
-        from fastapi import HTTPException
+async def delete_comment(comment_id: str, current_user: dict = Depends(get_current_user), comments_collection = Depends(get_comments_collection), counts_collection = Depends(get_comment_counts_collection)):
+    query = {"_id": ObjectId(comment_id), "user_id": ObjectId(current_user["id"])}
+    existing = await comments_collection.find_one(query)
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Comment not found or you don't have permission to delete it")
+    counters = dict([item_counter(existing["item_type"], existing["item_id"]), user_counter(current_user["id"])])
+    await seed_counts(counts_collection, comments_collection, counters)
+    if await comments_collection.find_one_and_delete(query) is None:
         raise HTTPException(status_code=404, detail="Comment not found or you don't have permission to delete it")
+    await bump_counts(counts_collection, counters, -1)
     return {"message": "Comment deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Optional
+import httpx
+import logging
+import orjson
+
+from cache import set_objects
+from config import settings
+from deadline import clear_deadline
+from expansion import RELATIONS, expand_many, expansion_tree, resource_key
+from fieldsets import apply_fieldsets, parse_fieldsets
+from mirror import fetch_page, get_index
+from upstream import get_http_client
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+async def catalogue_chunks(resource: str, client: httpx.AsyncClient) -> AsyncIterator[list[dict]]:
+    index = await get_index(resource, client)
+    if index is not None:
+        for start in range(0, len(index.items), settings.EXPORT_CHUNK_SIZE):
+            yield index.items[start:start + settings.EXPORT_CHUNK_SIZE]
+        return
+    page = 1
+    while True:
+        data = await fetch_page(resource, page, client)
+        items = data.get("results") or []
+        await set_objects({key: item for item in items if (key := resource_key(resource, item.get("url")))}, settings.CACHE_TTL)
+        yield items
+        if not data.get("next"):
+            return
+        page += 1
+
+async def export_lines(resource: str, chunk: Optional[list[dict]], chunks: AsyncIterator[list[dict]], tree: dict, fieldsets: dict, client: httpx.AsyncClient) -> AsyncIterator[bytes]:
+    # The stream lasts as long as the client keeps reading; only the first
+    # chunk, fetched before the response starts, is bound by the deadline.
+    clear_deadline()
+    while chunk is not None:
+        items = [dict(item) for item in chunk]
+        if tree:
+            await expand_many([(item, resource, tree) for item in items], client)
+        for item in items:
+            yield orjson.dumps(apply_fieldsets(item, fieldsets)) + b"\n"
+        chunk = await anext(chunks, None)
+
+@router.get("/export/{resource}.ndjson", tags=["export"], description="Stream every item of a resource as newline-delimited JSON", summary="Export a resource")
+async def export_resource(request: Request, resource: str, expand: Optional[str] = None, client: httpx.AsyncClient = Depends(get_http_client)):
+    if resource not in RELATIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown resource '{resource}'")
+    fieldsets = parse_fieldsets(request)
+    tree = expansion_tree(resource, [], expand, fieldsets)
+    chunks = catalogue_chunks(resource, client)
+    try:
+        first = await anext(chunks, None)
+    except Exception as e:
+        logger.error(f"Error exporting {resource}: {e}")
+        raise HTTPException(status_code=502, detail=f"Could not fetch {resource} from SWAPI")
+    return StreamingResponse(export_lines(resource, first, chunks, tree, fieldsets, client), media_type="application/x-ndjson")
@@ -3,19 +3,33 @@ from config import settings
 from pydantic import BaseModel, Field
 from typing import Optional, Union
 import httpx
-from pymongo import MongoClient
 from bson import ObjectId
+from pymongo import UpdateOne
 
 from routers.auth import get_current_user
-
-client = MongoClient(settings.MONGO_URI)
-db = client[settings.MONGO_DB]
-favorites_collection = db["favorites"]
+from database import get_favorites_collection
+from expansion import RELATIONS, fetch_resources
+from upstream import get_http_client
 
 router = APIRouter()
 
 BASE_URL = settings.BASE_URL + "favorites"
 
+class favorite_item(BaseModel):
+    type: str
+    item_id: str
+
+def favorite_key(favorite: dict) -> Optional[str]:
+    if favorite.get("type") not in RELATIONS or not str(favorite.get("item_id", "")).isdigit():
+        return None
+    return f"{favorite['type']}/{int(favorite['item_id'])}"
+
+async def hydrate_favorites(favorites: list[dict], client: httpx.AsyncClient) -> list[dict]:
+    resolved = await fetch_resources([key for key in map(favorite_key, favorites) if key], client)
+    for favorite in favorites:
+        favorite["item"] = resolved.get(favorite_key(favorite))
+    return favorites
+
 def convert_objectid_to_str(doc):
     if doc is None:
         return None
@@ -35,28 +49,52 @@ def convert_objectid_to_str(doc):
 
 
 @router.get("/favorites", tags=["favorites"], description="Get all favorites", summary="Get all favorites, to use this feature you need to be authenticated")
-async def get_favorites(current_user: dict = Depends(get_current_user)):
+async def get_favorites(expand: bool = False, current_user: dict = Depends(get_current_user), favorites_collection = Depends(get_favorites_collection), client: httpx.AsyncClient = Depends(get_http_client)):
+    user_id = current_user["id"]
+    favorites = [convert_objectid_to_str(favorite) for favorite in await favorites_collection.find({"user_id": user_id}).to_list()]
+    if expand:
+        await hydrate_favorites(favorites, client)
+    return favorites
+
+@router.post("/favorites/bulk", tags=["favorites"], description="Add many favorites at once", summary="Add many favorites")
+async def add_favorites(favorites: list[favorite_item], current_user: dict = Depends(get_current_user), favorites_collection = Depends(get_favorites_collection)):
+    user_id = current_user["id"]
+    if not favorites:
+        return {"message": "Favorites added successfully", "added": 0}
+    operations = [
+        UpdateOne({"user_id": user_id, "type": favorite.type, "item_id": favorite.item_id}, {"$setOnInsert": {"user_id": user_id, "type": favorite.type, "item_id": favorite.item_id}}, upsert=True)
+        for favorite in favorites
+    ]
+    result = await favorites_collection.bulk_write(operations, ordered=False)
+    return {"message": "Favorites added successfully", "added": result.upserted_count}
+
+@router.delete("/favorites/bulk", tags=["favorites"], description="Delete many favorites at once", summary="Delete many favorites")
+async def delete_favorites(favorites: list[favorite_item], current_user: dict = Depends(get_current_user), favorites_collection = Depends(get_favorites_collection)):
     user_id = current_user["id"]
-    favorites = favorites_collection.find({"user_id": user_id})
-    return [convert_objectid_to_str(favorite) for favorite in favorites]
+    if not favorites:
+        return {"message": "Favorites deleted successfully", "deleted": 0}
+    result = await favorites_collection.delete_many({"user_id": user_id, "$or": [{"type": favorite.type, "item_id": favorite.item_id} for favorite in favorites]})
+    return {"message": "Favorites deleted successfully", "deleted": result.deleted_count}
 
-@router.get("/favorites/{type}", tags=["favorites"], description="Get a favorite", summary="Get a favorite, to use this feature you need to be authenticated")
-async def get_favorite(type: str, current_user: dict = Depends(get_current_user)):
+@router.get("/favorites/{type}", tags=["favorites"], description="Get all favorites of a type", summary="Get all favorites of a type, to use this feature you need to be authenticated")
+async def get_favorite(type: str, expand: bool = False, current_user: dict = Depends(get_current_user), favorites_collection = Depends(get_favorites_collection), client: httpx.AsyncClient = Depends(get_http_client)):
     user_id = current_user["id"]
-    favorite = favorites_collection.find_one({"user_id": user_id, "type": type})
-    return convert_objectid_to_str(favorite)
+    favorites = [convert_objectid_to_str(favorite) for favorite in await favorites_collection.find({"user_id": user_id, "type": type}).to_list()]
+    if expand:
+        await hydrate_favorites(favorites, client)
+    return favorites
 
 @router.post("/favorites/{type}", tags=["favorites"], description="Add a favorite", summary="Add a favorite")
-async def add_favorite(item_id: str, type: str, current_user: dict = Depends(get_current_user)):
+async def add_favorite(item_id: str, type: str, current_user: dict = Depends(get_current_user), favorites_collection = Depends(get_favorites_collection)):
     user_id = current_user["id"]
-    favorite = favorites_collection.find_one({"user_id": user_id, "type": type})
-    if favorite:
+    favorite = {"user_id": user_id, "type": type, "item_id": item_id}
+    result = await favorites_collection.update_one(favorite, {"$setOnInsert": favorite}, upsert=True)
+    if result.upserted_id is None:
         raise HTTPException(status_code=400, detail="Favorite already exists")
-    favorites_collection.insert_one({"user_id": user_id, "type": type, "item_id": item_id})
     return {"message": "Favorite added successfully"}
 
 @router.delete("/favorites/{type}", tags=["favorites"], description="Delete a favorite", summary="Delete a favorite")
-async def delete_favorite(item_id: str, type: str, current_user: dict = Depends(get_current_user)):
+async def delete_favorite(item_id: str, type: str, current_user: dict = Depends(get_current_user), favorites_collection = Depends(get_favorites_collection)):
     user_id = current_user["id"]
-    favorites_collection.delete_one({"user_id": user_id, "type": type, "item_id": item_id})
+    await favorites_collection.delete_one({"user_id": user_id, "type": type, "item_id": item_id})
     return {"message": "Favorite deleted successfully"}
\ No newline at end of file
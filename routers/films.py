@@ -1,10 +1,9 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel, Field
 from typing import Optional, Union
 from config import settings
 import httpx
 import logging
-import json
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -12,7 +11,11 @@ router = APIRouter()
 
 BASE_URL = settings.BASE_URL + "films"
 
-from cache import get_cache, set_cache, delete_cache
+from expansion import expand_relations, expansion_tree, fetch_resource
+from mirror import list_page
+from fieldsets import apply_fieldsets, parse_fieldsets
+from responses import cache_response, get_cached_response
+from upstream import get_http_client
 
 class film(BaseModel):
     title: str = Field(default=None)
@@ -37,89 +40,46 @@ class search_films(BaseModel):
     previous: Optional[str] = None
     results: Optional[list[film]] = None
 
-async def get_detailed_data(data: str, films_data: dict, client: httpx.AsyncClient) -> dict:
-    if "results" in films_data:
-        items = films_data["results"]
-    else:
-        items = [films_data]
-    for film_item in items:
-        urls = film_item.get(data, [])
-        detailed_data = []
-        for url in urls:
-            try:
-                data_id = int(url.rstrip('/').split('/')[-1])
-                cache_key = f"{data}/{data_id}"
-                cached_data = await get_cache(cache_key)
-                logger.info(f"Cached data: {cached_data}")
-                if cached_data:
-                    detailed_data.append(json.loads(cached_data))
-                else:
-                    data_resp = await client.get(f"{settings.BASE_URL}{data}/{data_id}")
-                    logger.info(f"Data response: {data_resp.json()}")
-                    if data_resp.status_code == 200:
-                        response_data = data_resp.json()
-                        detailed_data.append(response_data)
-                        await set_cache(cache_key, json.dumps(response_data), 60 * 60 * 24)
-                    else:
-                        detailed_data.append(url)
-            except Exception as e:
-                logger.error(f"Error processing {data} for URL {url}: {e}")
-                detailed_data.append(url)
-        film_item[data] = detailed_data
-
-async def validate_details(species: bool, people: bool, starships: bool, vehicles: bool, planets: bool, data: dict, client: httpx.AsyncClient) -> bool:
+async def validate_details(species: bool, people: bool, starships: bool, vehicles: bool, planets: bool, data: dict, client: httpx.AsyncClient, expand: Optional[str] = None, fieldsets: Optional[dict] = None) -> bool:
     logger.info("Validating details")
-    if species:
-        await get_detailed_data("species", data, client)
-    if people:
-        await get_detailed_data("characters", data, client)
-    if starships:
-        await get_detailed_data("starships", data, client)
-    if vehicles:
-        await get_detailed_data("vehicles", data, client)
-    if planets:
-        await get_detailed_data("planets", data, client)
-
+    flags = {"species": species, "characters": people, "starships": starships, "vehicles": vehicles, "planets": planets}
+    await expand_relations("films", data, expansion_tree("films", [field for field, enabled in flags.items() if enabled], expand, fieldsets), client)
 
 
-@router.get("/films", tags=["films"], description="Get all films or search by title", summary="Get all films")
+@router.get("/films", tags=["films"], description="Get all films or search by title", summary="Get all films", response_model_exclude_unset=True)
 async def get_films(
+        request: Request,
         search: str = None, 
         species: bool = False, 
         people: bool = False, 
         starships: bool = False, 
         vehicles: bool = False, 
         planets: bool = False,
-        n: int = 10,
-        page: int = 1,
+        n: int = Query(10, ge=1, le=settings.PAGE_MAX_SIZE),
+        page: int = Query(1, ge=1),
         order_by: str = "title",
-        order_direction: str = "asc"
+        order_direction: str = "asc",
+        expand: Optional[str] = None,
+        client: httpx.AsyncClient = Depends(get_http_client)
     ) -> search_films:
-    if search:
-        url = f"{BASE_URL}?search={search}"
-    else:
-        url = BASE_URL
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        films_data = response.json()
-
-        await validate_details(species, people, starships, vehicles, planets, films_data, client)
-
-        response = search_films(**films_data)
-        if response.results:
-            start_idx = (page - 1) * n
-            end_idx = page * n
-            response.results = response.results[start_idx:end_idx]
-
-        if order_by:
-            response.results = sorted(response.results, key=lambda x: getattr(x, order_by, ""), reverse=order_direction == "desc")
-
-        return response
+    cached = await get_cached_response(request, "films")
+    if cached is not None:
+        return cached
+    films_data = await list_page("films", search, n, page, order_by, order_direction, request, client)
+    if films_data is None:
+        raise HTTPException(status_code=502, detail="Could not fetch films from SWAPI")
+    fieldsets = parse_fieldsets(request)
+    await validate_details(species, people, starships, vehicles, planets, films_data, client, expand, fieldsets)
+    return await cache_response(request, "films", search_films(**apply_fieldsets(films_data, fieldsets)))
 
-@router.get("/films/{film_id}", tags=["films"], description="Get a film by ID", summary="Get a film by ID")
-async def get_film(film_id: int, species: bool = False, people: bool = False, starships: bool = False, vehicles: bool = False, planets: bool = False) -> film:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{BASE_URL}/{film_id}")
-        film_data = response.json()
-        await validate_details(species, people, starships, vehicles, planets, film_data, client)
-        return film(**film_data)
\ No newline at end of file
+@router.get("/films/{film_id}", tags=["films"], description="Get a film by ID", summary="Get a film by ID", response_model_exclude_unset=True)
+async def get_film(request: Request, film_id: int, species: bool = False, people: bool = False, starships: bool = False, vehicles: bool = False, planets: bool = False, expand: Optional[str] = None, client: httpx.AsyncClient = Depends(get_http_client)) -> film:
+    cached = await get_cached_response(request, "films")
+    if cached is not None:
+        return cached
+    film_data = await fetch_resource(f"films/{film_id}", client)
+    if film_data is None:
+        raise HTTPException(status_code=404, detail="Film not found")
+    fieldsets = parse_fieldsets(request)
+    await validate_details(species, people, starships, vehicles, planets, film_data, client, expand, fieldsets)
+    return await cache_response(request, "films", film(**apply_fieldsets(film_data, fieldsets)))
\ No newline at end of file
@@ -1,20 +1,23 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from config import settings
 from pydantic import BaseModel, Field
 from typing import Optional, Union
 import httpx
-import json
 
 router = APIRouter()
 
 BASE_URL = settings.BASE_URL + "people"
 
-from cache import get_cache, set_cache, delete_cache
+from expansion import expand_relations, expansion_tree, fetch_resource
+from mirror import list_page
+from fieldsets import apply_fieldsets, parse_fieldsets
+from responses import cache_response, get_cached_response
+from upstream import get_http_client
 
 class person(BaseModel):
     name: str = Field(default=None)
-    height: int = Field(default=None)
-    mass: int = Field(default=None)
+    height: Optional[Union[int, str]] = None
+    mass: Optional[Union[int, str]] = None
     hair_color: str = Field(default=None)
     skin_color: str = Field(default=None)
     eye_color: str = Field(default=None)
@@ -35,94 +38,30 @@ class search_people(BaseModel):
     previous: Optional[str] = None
     results: Optional[list[person]] = None
 
-async def get_detailed_data(data: str, people_data: dict, client: httpx.AsyncClient) -> dict:
-    if "results" in people_data:
-        items = people_data["results"]
-    else:
-        items = [people_data]
-    
-    for person_item in items:
-        if data == "homeworld":
-            field_name = "planets"
-            url = person_item.get(data)
-            if url:
-                try:
-                    planet_id = int(url.rstrip('/').split('/')[-1])
-                    cache_key = f"{field_name}/{planet_id}"
-                    cached_data = await get_cache(cache_key)
-                    if cached_data:
-                        person_item[data] = json.loads(cached_data)
-                    else:
-                        planet_resp = await client.get(f"{settings.BASE_URL}{field_name}/{planet_id}")
-                        if planet_resp.status_code == 200:
-                            planet_data = planet_resp.json()
-                            person_item[data] = planet_data
-                            await set_cache(cache_key, json.dumps(planet_data), 60 * 60 * 24)
-                except Exception:
-                    pass 
-        else:
-            field_name = data
-            urls = person_item.get(data, [])
-            if urls is None:
-                urls = []
-            elif isinstance(urls, str):
-                urls = [urls]
-            detailed_data = []
-            for url in urls:
-                try:
-                    data_id = int(url.rstrip('/').split('/')[-1])
-                    cache_key = f"{field_name}/{data_id}"
-                    cached_data = await get_cache(cache_key)
-                    if cached_data:
-                        detailed_data.append(json.loads(cached_data))
-                    else:
-                        data_resp = await client.get(f"{settings.BASE_URL}{field_name}/{data_id}")
-                        if data_resp.status_code == 200:
-                            response_data = data_resp.json()
-                            detailed_data.append(response_data)
-                            await set_cache(cache_key, json.dumps(response_data), 60 * 60 * 24)
-                        else:
-                            detailed_data.append(url)
-                except Exception:
-                    detailed_data.append(url)
-            person_item[data] = detailed_data
-    
-async def validate_details(films: bool, species: bool, starships: bool, vehicles: bool, homeworld: bool, data: dict, client: httpx.AsyncClient) -> dict:
-    if films:
-        await get_detailed_data("films", data, client)
-    if species:
-        await get_detailed_data("species", data, client)
-    if starships:
-        await get_detailed_data("starships", data, client)
-    if vehicles:
-        await get_detailed_data("vehicles", data, client)
-    if homeworld:
-        await get_detailed_data("homeworld", data, client)
+async def validate_details(films: bool, species: bool, starships: bool, vehicles: bool, homeworld: bool, data: dict, client: httpx.AsyncClient, expand: Optional[str] = None, fieldsets: Optional[dict] = None) -> dict:
+    flags = {"films": films, "species": species, "starships": starships, "vehicles": vehicles, "homeworld": homeworld}
+    await expand_relations("people", data, expansion_tree("people", [field for field, enabled in flags.items() if enabled], expand, fieldsets), client)
 
-@router.get("/people", tags=["people"], description="Get all people or search by name", summary="Get all people")
-async def get_people(search: str = None, films: bool = False, species: bool = False, starships: bool = False, vehicles: bool = False, homeworld: bool = False, n: int = 10, page: int = 1, order_by: str = "name", order_direction: str = "asc") -> search_people:
-    if search:
-        url = f"{BASE_URL}?search={search}"
-    else:
-        url = BASE_URL
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        people_data = response.json()
-        await validate_details(films, species, starships, vehicles, homeworld, people_data, client)
-        response = search_people(**people_data)
-        if response.results:
-            start_idx = (page - 1) * n
-            end_idx = page * n
-            response.results = response.results[start_idx:end_idx]
+@router.get("/people", tags=["people"], description="Get all people or search by name", summary="Get all people", response_model_exclude_unset=True)
+async def get_people(request: Request, search: str = None, films: bool = False, species: bool = False, starships: bool = False, vehicles: bool = False, homeworld: bool = False, n: int = Query(10, ge=1, le=settings.PAGE_MAX_SIZE), page: int = Query(1, ge=1), order_by: str = "name", order_direction: str = "asc", expand: Optional[str] = None, client: httpx.AsyncClient = Depends(get_http_client)) -> search_people:
+    cached = await get_cached_response(request, "people")
+    if cached is not None:
+        return cached
+    people_data = await list_page("people", search, n, page, order_by, order_direction, request, client)
+    if people_data is None:
+        raise HTTPException(status_code=502, detail="Could not fetch people from SWAPI")
+    fieldsets = parse_fieldsets(request)
+    await validate_details(films, species, starships, vehicles, homeworld, people_data, client, expand, fieldsets)
+    return await cache_response(request, "people", search_people(**apply_fieldsets(people_data, fieldsets)))
 
-        if order_by:
-            response.results = sorted(response.results, key=lambda x: getattr(x, order_by, ""), reverse=order_direction == "desc")
-        return response
-
-@router.get("/people/{person_id}", tags=["people"], description="Get a person by ID", summary="Get a person by ID")
-async def get_person(person_id: int, films: bool = False, species: bool = False, starships: bool = False, vehicles: bool = False, homeworld: bool = False) -> person:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{BASE_URL}/{person_id}")
-        person_data = response.json()
-        await validate_details(films, species, starships, vehicles, homeworld, {"results": [person_data]}, client)
-        return person(**person_data)
\ No newline at end of file
+@router.get("/people/{person_id}", tags=["people"], description="Get a person by ID", summary="Get a person by ID", response_model_exclude_unset=True)
+async def get_person(request: Request, person_id: int, films: bool = False, species: bool = False, starships: bool = False, vehicles: bool = False, homeworld: bool = False, expand: Optional[str] = None, client: httpx.AsyncClient = Depends(get_http_client)) -> person:
+    cached = await get_cached_response(request, "people")
+    if cached is not None:
+        return cached
+    person_data = await fetch_resource(f"people/{person_id}", client)
+    if person_data is None:
+        raise HTTPException(status_code=404, detail="Person not found")
+    fieldsets = parse_fieldsets(request)
+    await validate_details(films, species, starships, vehicles, homeworld, person_data, client, expand, fieldsets)
+    return await cache_response(request, "people", person(**apply_fieldsets(person_data, fieldsets)))
\ No newline at end of file
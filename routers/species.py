@@ -1,10 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from config import settings
 from pydantic import BaseModel, Field
 from typing import Optional, Union
 import httpx
-import json
-from cache import get_cache, set_cache, delete_cache
+from expansion import expand_relations, expansion_tree, fetch_resource
+from mirror import list_page
+from fieldsets import apply_fieldsets, parse_fieldsets
+from responses import cache_response, get_cached_response
+from upstream import get_http_client
 
 router = APIRouter()
 
@@ -34,83 +37,30 @@ class search_species(BaseModel):
     results: Optional[list[species]] = None
 
 
-async def get_detailed_data(data: str, species_data: dict, client: httpx.AsyncClient) -> dict:
-    if "results" in species_data:
-        items = species_data["results"]
-    else:
-        items = [species_data]
-    
-    for species_item in items:
-        if data == "homeworld":
-            field_name = "homeworld"
-            url = species_item.get(field_name)
-            if url:
-                try:
-                    planet_id = int(url.rstrip('/').split('/')[-1])
-                    cache_key = f"planets/{planet_id}"
-                    cached_data = await get_cache(cache_key)
-                    if cached_data:
-                        species_item[field_name] = json.loads(cached_data)
-                    else:
-                        planet_resp = await client.get(f"{settings.BASE_URL}planets/{planet_id}")
-                        if planet_resp.status_code == 200:
-                            species_item[field_name] = planet_resp.json()
-                            await set_cache(cache_key, json.dumps(planet_resp.json()), 60 * 60 * 24)
-                        else:
-                            species_item[field_name] = url
-                except Exception:
-                    pass
-        else:
-            field_name = data
-            urls = species_item.get(data, [])
-            if urls is None:
-                urls = []
-            elif isinstance(urls, str):
-                urls = [urls]
-            detailed_data = []
-            for url in urls:
-                try:
-                    data_id = int(url.rstrip('/').split('/')[-1])
-                    data_resp = await client.get(f"{settings.BASE_URL}{field_name}/{data_id}")
-                    if data_resp.status_code == 200:
-                        detailed_data.append(data_resp.json())
-                    else:
-                        detailed_data.append(url)
-                except Exception:
-                    detailed_data.append(url)
-            species_item[field_name] = detailed_data
+async def validate_details(homeworld: bool, films: bool, people: bool, species_data: dict, client: httpx.AsyncClient, expand: Optional[str] = None, fieldsets: Optional[dict] = None) -> dict:
+    flags = {"homeworld": homeworld, "films": films, "people": people}
+    await expand_relations("species", species_data, expansion_tree("species", [field for field, enabled in flags.items() if enabled], expand, fieldsets), client)
 
-async def validate_details(homeworld: bool, films: bool, people: bool, species_data: dict, client: httpx.AsyncClient) -> dict:
-    if homeworld:
-        await get_detailed_data("homeworld", species_data, client)
-    if films:
-        await get_detailed_data("films", species_data, client)
-    if people:
-        await get_detailed_data("people", species_data, client)
+@router.get("/species", tags=["species"], description="Get all species or search by name", summary="Get all species", response_model_exclude_unset=True)
+async def get_species(request: Request, search: str = None, homeworld: bool = False, films: bool = False, people: bool = False, n: int = Query(10, ge=1, le=settings.PAGE_MAX_SIZE), page: int = Query(1, ge=1), order_by: str = "name", order_direction: str = "asc", expand: Optional[str] = None, client: httpx.AsyncClient = Depends(get_http_client)) -> search_species:
+    cached = await get_cached_response(request, "species")
+    if cached is not None:
+        return cached
+    species_data = await list_page("species", search, n, page, order_by, order_direction, request, client)
+    if species_data is None:
+        raise HTTPException(status_code=502, detail="Could not fetch species from SWAPI")
+    fieldsets = parse_fieldsets(request)
+    await validate_details(homeworld, films, people, species_data, client, expand, fieldsets)
+    return await cache_response(request, "species", search_species(**apply_fieldsets(species_data, fieldsets)))
 
-@router.get("/species", tags=["species"], description="Get all species or search by name", summary="Get all species")
-async def get_species(search: str = None, homeworld: bool = False, films: bool = False, people: bool = False, n: int = 10, page: int = 1, order_by: str = "name", order_direction: str = "asc") -> search_species:
-    if search:
-        url = f"{BASE_URL}?search={search}"
-    else:
-        url = BASE_URL
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        species_data = response.json()
-        await validate_details(homeworld, films, people, species_data, client)
-        response = search_species(**species_data)
-        if response.results:
-            start_idx = (page - 1) * n
-            end_idx = page * n
-            response.results = response.results[start_idx:end_idx]
-        if order_by:
-            response.results = sorted(response.results, key=lambda x: getattr(x, order_by, ""), reverse=order_direction == "desc")
-        return response
-
-@router.get("/species/{species_id}", tags=["species"], description="Get a species by ID", summary="Get a species by ID")
-async def get_species(species_id: int, homeworld: bool = False, films: bool = False, people: bool = False) -> species:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{BASE_URL}/{species_id}")
-        species_data = response.json()
-        await validate_details(homeworld, films, people, species_data, client)
-        return species(**species_data)
\ No newline at end of file
+@router.get("/species/{species_id}", tags=["species"], description="Get a species by ID", summary="Get a species by ID", response_model_exclude_unset=True)
+async def get_species(request: Request, species_id: int, homeworld: bool = False, films: bool = False, people: bool = False, expand: Optional[str] = None, client: httpx.AsyncClient = Depends(get_http_client)) -> species:
+    cached = await get_cached_response(request, "species")
+    if cached is not None:
+        return cached
+    species_data = await fetch_resource(f"species/{species_id}", client)
+    if species_data is None:
+        raise HTTPException(status_code=404, detail="Species not found")
+    fieldsets = parse_fieldsets(request)
+    await validate_details(homeworld, films, people, species_data, client, expand, fieldsets)
+    return await cache_response(request, "species", species(**apply_fieldsets(species_data, fieldsets)))
\ No newline at end of file
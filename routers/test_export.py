@@ -0,0 +1,27 @@
+import json
+
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_export_people():
+    count = client.get("/people").json()["count"]
+    response = client.get("/export/people.ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == count
+    assert len({line["url"] for line in lines}) == count
+
+def test_export_films_expanded():
+    response = client.get("/export/films.ndjson", params={"expand": "characters", "fields": "title,characters", "fields[characters]": "name"})
+    assert response.status_code == 200
+    for line in response.text.splitlines():
+        film = json.loads(line)
+        assert set(film) == {"title", "characters"}
+        assert all(set(character) == {"name"} for character in film["characters"])
+
+def test_export_unknown_resource():
+    response = client.get("/export/droids.ndjson")
+    assert response.status_code == 404
@@ -12,4 +12,30 @@ def test_get_films():
 def test_get_film():
     response = client.get("/films/1")
     assert response.status_code == 200
-    assert response.json() is not None
\ No newline at end of file
+    assert response.json() is not None
+
+def test_get_film_nested_expand():
+    response = client.get("/films/1", params={"expand": "characters.homeworld"})
+    assert response.status_code == 200
+    character = response.json()["characters"][0]
+    assert isinstance(character, dict)
+    assert isinstance(character["homeworld"], dict)
+
+def test_get_film_invalid_expand():
+    response = client.get("/films/1", params={"expand": "characters.unknown"})
+    assert response.status_code == 400
+
+def test_get_film_cached_bytes():
+    first = client.get("/films/1", params={"people": True})
+    second = client.get("/films/1", params={"people": True})
+    assert first.status_code == second.status_code == 200
+    assert second.headers["content-type"] == "application/json"
+    assert second.content == first.content
+
+def test_get_films_compressed():
+    identity = client.get("/films", params={"people": True}, headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/films", params={"people": True}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in identity.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] != identity.headers["etag"]
+    assert compressed.json() == identity.json()
@@ -9,7 +9,58 @@ def test_get_people():
     assert response.json() is not None
     assert len(response.json()["results"]) == 3
 
+def test_get_people_invalid_paging():
+    for params in ({"n": 0}, {"n": -5}, {"page": 0}, {"n": 1000}):
+        response = client.get("/people", params=params)
+        assert response.status_code == 422
+
 def test_get_person():
     response = client.get("/people/1")
     assert response.status_code == 200
-    assert response.json() is not None
\ No newline at end of file
+    assert response.json() is not None
+
+def test_get_person_sparse_fields():
+    response = client.get("/people/1", params={"fields": "name,films", "films": True, "fields[films]": "title"})
+    assert response.status_code == 200
+    person = response.json()
+    assert set(person) == {"name", "films"}
+    assert all(set(film) == {"title"} for film in person["films"])
+
+def test_get_person_not_modified():
+    response = client.get("/people/1")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"]
+    response = client.get("/people/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+def test_get_person_cached_hits_counted(monkeypatch):
+    import cache
+    from config import settings
+    monkeypatch.setattr(settings, "POPULARITY_TRACKING", True)
+    monkeypatch.setattr(cache, "popularity", cache.Counter())
+    for _ in range(2):
+        response = client.get("/people/2", params={"fields": "name,homeworld", "homeworld": True})
+        assert response.status_code == 200
+    homeworld = response.json()["homeworld"]
+    assert cache.popularity["people/2"] == 2
+    assert cache.popularity[f"planets/{homeworld['url'].rstrip('/').split('/')[-1]}"] == 2
+
+def test_get_people_cached_hits_counted(monkeypatch):
+    import cache
+    from config import settings
+    monkeypatch.setattr(settings, "POPULARITY_TRACKING", True)
+    monkeypatch.setattr(cache, "popularity", cache.Counter())
+    params = {"n": 2, "page": 3, "homeworld": True}
+    client.get("/people", params=params)
+    missed = dict(cache.popularity)
+    response = client.get("/people", params=params)
+    assert response.status_code == 200
+    assert all(f"people/{person['url'].rstrip('/').split('/')[-1]}" not in cache.popularity for person in response.json()["results"])
+    assert dict(cache.popularity) == {key: count * 2 for key, count in missed.items()}
+
+def test_get_person_not_found():
+    for _ in range(2):
+        response = client.get("/people/9999")
+        assert response.status_code == 404
@@ -1,10 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from config import settings
 from pydantic import BaseModel, Field
 from typing import Optional, Union
 import httpx
-import json
-from cache import get_cache, set_cache, delete_cache
+from expansion import expand_relations, expansion_tree, fetch_resource
+from mirror import list_page
+from fieldsets import apply_fieldsets, parse_fieldsets
+from responses import cache_response, get_cached_response
+from upstream import get_http_client
 
 router = APIRouter()
 
@@ -33,70 +36,30 @@ class search_vehicles(BaseModel):
     previous: Optional[str] = None
     results: Optional[list[vehicle]] = None
 
-async def get_detailed_data(data: str, vehicles_data: dict, client: httpx.AsyncClient) -> dict:
-    if "results" in vehicles_data:
-        items = vehicles_data["results"]
-    else:
-        items = [vehicles_data]
-    for vehicle_item in items:
-        urls = vehicle_item.get(data, [])
-        if urls is None:
-            urls = []
-        elif isinstance(urls, str):
-            urls = [urls]
-        detailed_data = []
-        if data == "pilots":
-            field_name = "people"
-        else:
-            field_name = data
-        for url in urls:
-            try:
-                data_id = int(url.rstrip('/').split('/')[-1])
-                cache_key = f"{field_name}/{data_id}"
-                cached_data = await get_cache(cache_key)
-                if cached_data:
-                    detailed_data.append(json.loads(cached_data))
-                else:
-                    data_resp = await client.get(f"{settings.BASE_URL}{field_name}/{data_id}")
-                    if data_resp.status_code == 200:
-                        response_data = data_resp.json()
-                        detailed_data.append(response_data)
-                        await set_cache(cache_key, json.dumps(response_data), 60 * 60 * 24)
-                    else:
-                        detailed_data.append(url)
-            except Exception:
-                detailed_data.append(url)
-        vehicle_item[data] = detailed_data
+async def validate_details(films: bool, pilots: bool, vehicles_data: dict, client: httpx.AsyncClient, expand: Optional[str] = None, fieldsets: Optional[dict] = None) -> dict:
+    flags = {"films": films, "pilots": pilots}
+    await expand_relations("vehicles", vehicles_data, expansion_tree("vehicles", [field for field, enabled in flags.items() if enabled], expand, fieldsets), client)
 
-async def validate_details(films: bool, pilots: bool, vehicles_data: dict, client: httpx.AsyncClient) -> dict:
-    if films:
-        await get_detailed_data("films", vehicles_data, client)
-    if pilots:
-        await get_detailed_data("pilots", vehicles_data, client)
+@router.get("/vehicles", tags=["vehicles"], description="Get all vehicles or search by name or model", summary="Get all vehicles", response_model_exclude_unset=True)
+async def get_vehicles(request: Request, search: str = None, films: bool = False, pilots: bool = False, n: int = Query(10, ge=1, le=settings.PAGE_MAX_SIZE), page: int = Query(1, ge=1), order_by: str = "name", order_direction: str = "asc", expand: Optional[str] = None, client: httpx.AsyncClient = Depends(get_http_client)) -> search_vehicles:
+    cached = await get_cached_response(request, "vehicles")
+    if cached is not None:
+        return cached
+    vehicles_data = await list_page("vehicles", search, n, page, order_by, order_direction, request, client)
+    if vehicles_data is None:
+        raise HTTPException(status_code=502, detail="Could not fetch vehicles from SWAPI")
+    fieldsets = parse_fieldsets(request)
+    await validate_details(films, pilots, vehicles_data, client, expand, fieldsets)
+    return await cache_response(request, "vehicles", search_vehicles(**apply_fieldsets(vehicles_data, fieldsets)))
 
-@router.get("/vehicles", tags=["vehicles"], description="Get all vehicles or search by name or model", summary="Get all vehicles")
-async def get_vehicles(search: str = None, films: bool = False, pilots: bool = False, n: int = 10, page: int = 1, order_by: str = "name", order_direction: str = "asc") -> search_vehicles:
-    if search:
-        url = f"{BASE_URL}?search={search}"
-    else:
-        url = BASE_URL
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        vehicles_data = response.json()
-        await validate_details(films, pilots, vehicles_data, client)
-        response = search_vehicles(**vehicles_data)
-        if response.results:
-            start_idx = (page - 1) * n
-            end_idx = page * n
-            response.results = response.results[start_idx:end_idx]
-        if order_by:
-            response.results = sorted(response.results, key=lambda x: getattr(x, order_by, ""), reverse=order_direction == "desc")
-        return response
-
-@router.get("/vehicles/{vehicle_id}", tags=["vehicles"], description="Get a vehicle by ID", summary="Get a vehicle by ID")
-async def get_vehicle(vehicle_id: int, films: bool = False, pilots: bool = False) -> vehicle:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{BASE_URL}/{vehicle_id}")
-        vehicle_data = response.json()
-        await validate_details(films, pilots, vehicle_data, client)
-        return vehicle(**vehicle_data)
\ No newline at end of file
+@router.get("/vehicles/{vehicle_id}", tags=["vehicles"], description="Get a vehicle by ID", summary="Get a vehicle by ID", response_model_exclude_unset=True)
+async def get_vehicle(request: Request, vehicle_id: int, films: bool = False, pilots: bool = False, expand: Optional[str] = None, client: httpx.AsyncClient = Depends(get_http_client)) -> vehicle:
+    cached = await get_cached_response(request, "vehicles")
+    if cached is not None:
+        return cached
+    vehicle_data = await fetch_resource(f"vehicles/{vehicle_id}", client)
+    if vehicle_data is None:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    fieldsets = parse_fieldsets(request)
+    await validate_details(films, pilots, vehicle_data, client, expand, fieldsets)
+    return await cache_response(request, "vehicles", vehicle(**apply_fieldsets(vehicle_data, fieldsets)))
\ No newline at end of file
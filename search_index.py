@@ -0,0 +1,105 @@
+from collections import defaultdict
+from typing import Optional
+
+SEARCH_FIELDS = {
+    "films": ("title",),
+    "people": ("name",),
+    "planets": ("name",),
+    "species": ("name",),
+    "starships": ("name", "model"),
+    "vehicles": ("name", "model"),
+}
+
+SORT_FIELDS = {
+    "films": ("title", "episode_id", "release_date", "created", "edited"),
+    "people": ("name", "height", "mass", "birth_year", "created", "edited"),
+    "planets": ("name", "diameter", "population", "rotation_period", "orbital_period", "surface_water", "created", "edited"),
+    "species": ("name", "average_height", "average_lifespan", "created", "edited"),
+    "starships": ("name", "model", "cost_in_credits", "length", "crew", "passengers", "cargo_capacity", "max_atmosphering_speed", "created", "edited"),
+    "vehicles": ("name", "model", "cost_in_credits", "length", "crew", "passengers", "cargo_capacity", "max_atmosphering_speed", "created", "edited"),
+}
+
+GRAM_SIZE = 3
+
+def sort_key(value):
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    if isinstance(value, str):
+        try:
+            return (0, float(value.replace(",", "")), "")
+        except ValueError:
+            return (1, 0, value.lower())
+    return (2, 0, "")
+
+def grams(text: str, size: int = GRAM_SIZE) -> set[str]:
+    result = set()
+    for length in range(1, size + 1):
+        for start in range(len(text) - length + 1):
+            result.add(text[start:start + length])
+    return result
+
+class ResourceIndex:
+    def __init__(self, resource: str, items: list[dict]):
+        self.resource = resource
+        self.items = items
+        self.texts = []
+        self.postings = defaultdict(set)
+        for position, item in enumerate(items):
+            texts = [str(item.get(field) or "").lower() for field in SEARCH_FIELDS[resource]]
+            self.texts.append(texts)
+            for text in texts:
+                for gram in grams(text):
+                    self.postings[gram].add(position)
+        self.orderings = {}
+        for field in SORT_FIELDS[resource]:
+            ascending = self.build_ordering(field)
+            self.orderings[field, False] = ascending
+            self.orderings[field, True] = self.reverse_ordering(field, ascending)
+
+    def build_ordering(self, field: str) -> list[int]:
+        return sorted(range(len(self.items)), key=lambda position: sort_key(self.items[position].get(field)))
+
+    def reverse_ordering(self, field: str, ascending: list[int]) -> list[int]:
+        # Values are only reversed within their kind, so text such as "unknown"
+        # and missing values stay after the numbers in both directions.
+        groups = defaultdict(list)
+        for position in ascending:
+            groups[sort_key(self.items[position].get(field))[0]].append(position)
+        return [position for kind in sorted(groups) for position in reversed(groups[kind])]
+
+    def ordering(self, field: str, descending: bool = False) -> list[int]:
+        if (field, descending) in self.orderings:
+            return self.orderings[field, descending]
+        ascending = self.build_ordering(field)
+        return self.reverse_ordering(field, ascending) if descending else ascending
+
+    def search(self, term: str) -> set[int]:
+        term = term.strip().lower()
+        if len(term) <= GRAM_SIZE:
+            return set(self.postings.get(term, ()))
+        candidates = None
+        for start in range(len(term) - GRAM_SIZE + 1):
+            posting = self.postings.get(term[start:start + GRAM_SIZE])
+            if not posting:
+                return set()
+            candidates = set(posting) if candidates is None else candidates & posting
+        return {position for position in candidates if any(term in text for text in self.texts[position])}
+
+    def query(self, search: Optional[str], order_by: Optional[str], descending: bool, start: int, end: int) -> tuple[int, list[dict]]:
+        matches = self.search(search) if search and search.strip() else None
+        if order_by:
+            positions = self.ordering(order_by, descending)
+        else:
+            positions = reversed(range(len(self.items))) if descending else range(len(self.items))
+        total = len(self.items) if matches is None else len(matches)
+        page = []
+        seen = 0
+        for position in positions:
+            if matches is not None and position not in matches:
+                continue
+            if seen >= end:
+                break
+            if seen >= start:
+                page.append(self.items[position])
+            seen += 1
+        return total, page
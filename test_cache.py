@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+from cache import CODECS, decode, encode, zstandard
+
+ENTITY = {"title": "A New Hope", "episode_id": 4, "opening_crawl": "It is a period of civil war. " * 40, "characters": [f"https://swapi.dev/api/people/{i}/" for i in range(1, 19)]}
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_codec_roundtrip(codec):
+    assert decode(encode(ENTITY, codec, compress_min_size=0)) == ENTITY
+    assert decode(encode(ENTITY, codec, compress_min_size=1)) == ENTITY
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")
+def test_compression_threshold():
+    small = encode({"name": "Luke"}, "orjson", compress_min_size=1024)
+    large = encode(ENTITY, "orjson", compress_min_size=1024)
+    assert small[0] == CODECS["orjson"][0]
+    assert large[0] != CODECS["orjson"][0]
+    assert len(large) < len(json.dumps(ENTITY))
+
+def test_legacy_json():
+    assert decode(json.dumps(ENTITY).encode()) == ENTITY
@@ -0,0 +1,63 @@
+import asyncio
+
+from cache import Missing, local_cache
+from deadline import DeadlineMiddleware, is_partial, mark_partial, remaining_time, request_budget
+from expansion import fetch_resources
+
+def test_negatively_cached_error_marks_partial():
+    local_cache.set("people/501", Missing(502), 10)
+    local_cache.set("people/502", Missing(404), 10)
+
+    async def resolve(key):
+        request_budget.set({"deadline": None, "partial": False})
+        failures = {}
+        resolved = await fetch_resources([key], None, failures)
+        return resolved, failures, is_partial()
+
+    try:
+        assert asyncio.run(resolve("people/501")) == ({}, {"people/501": 502}, True)
+        assert asyncio.run(resolve("people/502")) == ({}, {"people/502": 404}, False)
+    finally:
+        local_cache.delete("people/501")
+        local_cache.delete("people/502")
+
+def test_partial_marker_without_deadline():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["remaining"] = remaining_time()
+        mark_partial()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        seen["headers"] = message["headers"]
+
+    asyncio.run(DeadlineMiddleware(app, budget=0)({"type": "http"}, None, send))
+    assert seen["remaining"] is None
+    assert (b"x-partial-response", b"true") in seen["headers"]
+
+def test_lock_wait_respects_deadline(monkeypatch):
+    import time
+    import expansion
+    from config import settings
+
+    async def no_lock(name, ttl_ms):
+        return None
+
+    async def nothing_cached(keys, stale=None, missing=None):
+        return {}
+
+    monkeypatch.setattr(settings, "UPSTREAM_DISTRIBUTED_LOCK", True)
+    monkeypatch.setattr(settings, "UPSTREAM_LOCK_WAIT", 5.0)
+    monkeypatch.setattr(expansion, "acquire_lock", no_lock)
+    monkeypatch.setattr(expansion, "get_objects", nothing_cached)
+
+    async def resolve():
+        request_budget.set({"deadline": time.monotonic() + 0.2, "partial": False})
+        failures = {}
+        await fetch_resources(["people/503"], None, failures)
+        return failures, is_partial()
+
+    started = time.monotonic()
+    assert asyncio.run(resolve()) == ({"people/503": 504}, True)
+    assert time.monotonic() - started < 1
@@ -34,12 +34,15 @@ def test_add_favorite():
 
 def test_get_favorite():
     client.post("/favorites/films", params={"item_id": "1"}, headers={"Authorization": f"Bearer {token}"})
+    client.post("/favorites/films", params={"item_id": "2"}, headers={"Authorization": f"Bearer {token}"})
+    client.post("/favorites/people", params={"item_id": "1"}, headers={"Authorization": f"Bearer {token}"})
     response = client.get("/favorites/films", headers={"Authorization": f"Bearer {token}"})
     assert response.status_code == 200
-    favorite = response.json()
-    assert favorite is not None
-    assert favorite["type"] == "films"
-    assert favorite["item_id"] == "1"
+    favorites = response.json()
+    assert all(favorite["type"] == "films" for favorite in favorites)
+    assert {"1", "2"} <= {favorite["item_id"] for favorite in favorites}
+    client.delete("/favorites/films", params={"item_id": "2"}, headers={"Authorization": f"Bearer {token}"})
+    client.delete("/favorites/people", params={"item_id": "1"}, headers={"Authorization": f"Bearer {token}"})
 
 def test_get_favorites():
     client.post("/favorites/films", params={"item_id": "1"}, headers={"Authorization": f"Bearer {token}"})
@@ -54,6 +57,86 @@ def test_delete_favorite():
     assert response.status_code == 200
     assert response.json() == {"message": "Favorite deleted successfully"}
 
+def test_bulk_favorites():
+    favorites = [{"type": "people", "item_id": "1"}, {"type": "planets", "item_id": "1"}]
+    response = client.post("/favorites/bulk", json=favorites, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["added"] == 2
+    response = client.get("/favorites", params={"expand": True}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert all(favorite["item"] is not None for favorite in response.json())
+    response = client.request("DELETE", "/favorites/bulk", json=favorites, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["deleted"] == 2
+
+def test_comment_counts():
+    item_id = generate_username()
+    response = client.post("/comments/counts", json=[{"item_type": "films", "item_id": item_id}])
+    assert response.json()[0]["count"] == 0
+    response = client.post("/comments", json={"content": "test", "item_id": item_id, "item_type": "films"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    response = client.post("/comments/counts", json=[{"item_type": "films", "item_id": item_id}, {"item_type": "people", "item_id": item_id}])
+    assert response.status_code == 200
+    assert [count["count"] for count in response.json()] == [1, 0]
+
+def test_comment_counts_keep_newest_version(monkeypatch):
+    import asyncio
+    import cache
+    from routers.comments import cache_counts
+    # A client for this event loop; the app's one belongs to the TestClient's.
+    monkeypatch.setattr(cache, "redis_client", None)
+    key = f"item:films:{generate_username()}"
+
+    async def run():
+        await cache_counts({key: (2, 6)})
+        await cache_counts({key: (1, 5)})
+        return (await cache.get_many([f"comments:count:{key}"]))[0]
+
+    assert asyncio.run(run()) == "2:6"
+
+def test_comments_cursor_with_tied_created(monkeypatch):
+    from datetime import datetime
+    from routers import comments
+
+    class frozen(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2024, 1, 1)
+
+    monkeypatch.setattr(comments, "datetime", frozen)
+    item_id = generate_username()
+    for i in range(5):
+        response = client.post("/comments", json={"content": f"comment {i}", "item_id": item_id, "item_type": "films"}, headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+    seen = []
+    params = {"item_id": item_id, "item_type": "films", "limit": 2}
+    while True:
+        response = client.get("/comments", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["total"] == 5
+        seen += [comment["content"] for comment in body["comments"]]
+        if body["next_cursor"] is None:
+            break
+        params["after"] = body["next_cursor"]
+    assert seen == [f"comment {i}" for i in range(5)]
+    assert client.get("/comments", params={"item_id": item_id, "item_type": "films", "limit": 0}).status_code == 422
+    assert client.get("/comments", params={"item_id": item_id, "item_type": "films", "page": 0}).status_code == 422
+
+def test_batch():
+    response = client.post("/batch", json=[
+        {"resource": "people", "id": 1, "expand": "homeworld"},
+        {"resource": "planets", "id": 1, "fields": ["name", "residents.name"], "expand": "residents"},
+        {"resource": "people", "id": 1, "fields": ["name"]},
+        {"resource": "droids", "id": 1},
+    ])
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["status"] for result in results] == [200, 200, 200, 404]
+    assert isinstance(results[0]["data"]["homeworld"], dict)
+    assert set(results[1]["data"]) == {"name", "residents"}
+    assert results[2]["data"] == {"name": results[0]["data"]["name"]}
+
 def test_delete_user():
     response = client.delete("/user", headers={"Authorization": f"Bearer {token}"})
     assert response.status_code == 200
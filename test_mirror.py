@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import Request
+
+import mirror
+from deadline import is_partial, request_budget
+import upstream
+from config import settings
+
+PEOPLE = [{"name": f"Person {i}", "mass": str((i * 7) % 25), "url": f"{settings.BASE_URL}people/{i}/"} for i in range(1, 26)]
+
+def swapi(request: httpx.Request) -> httpx.Response:
+    page = int(request.url.params.get("page", 1))
+    return httpx.Response(200, json={"count": len(PEOPLE), "results": PEOPLE[(page - 1) * 10:page * 10]})
+
+async def noop(*args, **kwargs):
+    pass
+
+@pytest.fixture(autouse=True)
+def isolated_mirror(monkeypatch):
+    monkeypatch.setattr(settings, "MIRROR_ENABLED", True)
+    monkeypatch.setattr(mirror, "set_objects", noop)
+    for name in ("catalogues", "indexes", "synced_at", "loading"):
+        monkeypatch.setattr(mirror, name, {})
+    # Earlier tests may have opened the shared breaker or left fetches in flight.
+    monkeypatch.setattr(upstream, "breaker", upstream.CircuitBreaker(settings.UPSTREAM_CIRCUIT_FAILURE_THRESHOLD, settings.UPSTREAM_CIRCUIT_RESET_TIMEOUT))
+    monkeypatch.setattr(upstream, "limiter", upstream.AdaptiveLimiter(settings.UPSTREAM_CONCURRENCY_INITIAL, settings.UPSTREAM_CONCURRENCY_MIN, settings.UPSTREAM_CONCURRENCY_MAX))
+    monkeypatch.setattr(upstream, "inflight", {})
+
+async def slow_swapi(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(1)
+    return swapi(request)
+
+async def first_page(resource, search, client):
+    return {"count": len(PEOPLE), "results": PEOPLE[:10]}
+
+def list_people(handler=swapi, budget=None, **params):
+    request = Request({"type": "http", "method": "GET", "scheme": "http", "server": ("testserver", 80), "path": "/people", "query_string": b"", "headers": []})
+
+    async def run():
+        request_budget.set({"deadline": None if budget is None else time.monotonic() + budget, "partial": False})
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            result = await mirror.list_page("people", params.get("search"), params.get("n", 10), params.get("page", 1), params.get("order_by"), params.get("order_direction", "asc"), request, client)
+        return result, is_partial()
+
+    return asyncio.run(run())
+
+def test_list_page_across_upstream_pages():
+    result, partial = list_people(page=2, order_by="mass")
+    assert result["count"] == 25
+    assert result["next"] == "http://testserver/people?page=3"
+    assert not partial
+    assert result["previous"] == "http://testserver/people?page=1"
+    # The whole catalogue is sorted before the page is cut, not each upstream page.
+    masses = sorted(int(person["mass"]) for person in PEOPLE)
+    assert [int(person["mass"]) for person in result["results"]] == masses[10:20]
+
+def test_list_page_last_page():
+    result, partial = list_people(page=3, order_by="mass", order_direction="desc")
+    assert result["count"] == 25
+    assert result["next"] is None
+    assert [person["mass"] for person in result["results"]] == ["4", "3", "2", "1", "0"]
+    assert len(mirror.catalogues["people"]) == 25
+
+def test_cold_mirror_fallback_is_partial(monkeypatch):
+    monkeypatch.setattr(mirror, "fetch_listing", first_page)
+    result, partial = list_people(slow_swapi, budget=0.2, page=2)
+    assert result["results"] == []
+    assert partial
+
+def test_failed_mirror_load_is_partial(monkeypatch):
+    async def broken(resource, client):
+        raise RuntimeError("SWAPI is down")
+
+    monkeypatch.setattr(mirror, "fetch_listing", first_page)
+    monkeypatch.setattr(mirror, "sync_resource", broken)
+    result, partial = list_people(page=1)
+    assert len(result["results"]) == 10
+    assert partial
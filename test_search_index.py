@@ -0,0 +1,47 @@
+import pytest
+
+from search_index import ResourceIndex
+
+PEOPLE = [
+    {"name": "Luke Skywalker", "mass": "77"},
+    {"name": "Jabba Desilijic Tiure", "mass": "1,358"},
+    {"name": "Arvel Crynyd", "mass": "unknown"},
+    {"name": "Yoda", "mass": "17"},
+    {"name": "Leia Organa"},
+    {"name": "Anakin Skywalker", "mass": "84"},
+]
+
+@pytest.fixture
+def index():
+    return ResourceIndex("people", PEOPLE)
+
+def names(results):
+    return [item["name"] for item in results]
+
+def test_ngram_search(index):
+    assert index.search("sky") == {0, 5}
+    assert index.search("SKYWALKER") == {0, 5}
+    assert index.search("a") == {0, 1, 2, 3, 4, 5}
+    assert index.search("walkers") == set()
+    total, results = index.query("skywalker", "name", False, 0, 10)
+    assert total == 2
+    assert names(results) == ["Anakin Skywalker", "Luke Skywalker"]
+
+@pytest.mark.parametrize("descending, expected", [
+    (False, ["Yoda", "Luke Skywalker", "Anakin Skywalker", "Jabba Desilijic Tiure", "Arvel Crynyd", "Leia Organa"]),
+    (True, ["Jabba Desilijic Tiure", "Anakin Skywalker", "Luke Skywalker", "Yoda", "Arvel Crynyd", "Leia Organa"]),
+])
+def test_numeric_ordering(index, descending, expected):
+    total, results = index.query(None, "mass", descending, 0, 10)
+    assert total == len(PEOPLE)
+    assert names(results) == expected
+
+def test_page_slicing(index):
+    _, everything = index.query(None, "name", True, 0, 10)
+    assert names(everything) == sorted(names(PEOPLE), reverse=True)
+    pages = [index.query(None, "name", True, start, start + 4)[1] for start in (0, 4)]
+    assert [len(page) for page in pages] == [4, 2]
+    assert pages[0] + pages[1] == everything
+    total, results = index.query("skywalker", "mass", True, 1, 2)
+    assert total == 2
+    assert names(results) == ["Luke Skywalker"]
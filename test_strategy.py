@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from strategy import hash_password, hash_password_async, verify_password_async
+
+async def max_loop_lag(work) -> float:
+    lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal lag
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag = max(lag, time.perf_counter() - started - 0.005)
+
+    task = asyncio.create_task(ticker())
+    await work()
+    done.set()
+    await task
+    return lag
+
+def test_password_roundtrip():
+    async def roundtrip():
+        hashed = await hash_password_async("test123")
+        return await verify_password_async("test123", hashed), await verify_password_async("wrong", hashed)
+    assert asyncio.run(roundtrip()) == (True, False)
+
+def test_login_storm_does_not_block_event_loop():
+    hashed = hash_password("test123")
+    started = time.perf_counter()
+    hash_password("test123")
+    single_hash = time.perf_counter() - started
+
+    async def storm():
+        await asyncio.gather(*(verify_password_async("test123", hashed) for _ in range(16)))
+
+    lag = asyncio.run(max_loop_lag(storm))
+    assert lag < single_hash / 2
@@ -0,0 +1,43 @@
+import asyncio
+
+from upstream import AdaptiveLimiter, CircuitBreaker
+
+def test_circuit_opens_after_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_circuit_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == "half-open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+def test_limiter_bounds_and_adapts():
+    limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=4)
+    peak = 0
+
+    async def request(overloaded):
+        nonlocal peak
+        await limiter.acquire()
+        peak = max(peak, limiter.active)
+        await asyncio.sleep(0.01)
+        limiter.release(overloaded)
+
+    async def run():
+        await asyncio.gather(*(request(False) for _ in range(10)))
+        grown = limiter.limit
+        await request(True)
+        return grown
+
+    grown = asyncio.run(run())
+    assert peak <= 2
+    assert 2 < grown <= 4
+    assert limiter.limit == max(1, grown / 2)
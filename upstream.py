@@ -0,0 +1,222 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+
+from config import settings
+from deadline import DeadlineExceeded, remaining_time
+
+http_client = None
+http_client_loop = None
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.UPSTREAM_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.UPSTREAM_TIMEOUT, connect=settings.UPSTREAM_CONNECT_TIMEOUT),
+    )
+
+async def get_http_client() -> httpx.AsyncClient:
+    global http_client, http_client_loop
+    loop = asyncio.get_running_loop()
+    # The pool is bound to the loop that opened it; outside the app lifespan
+    # (e.g. a bare TestClient) every request may run on a fresh loop.
+    if http_client is None or http_client_loop is not loop:
+        http_client = create_http_client()
+        http_client_loop = loop
+    return http_client
+
+async def close_http_client():
+    global http_client, http_client_loop
+    if http_client is not None:
+        await http_client.aclose()
+    http_client = None
+    http_client_loop = None
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half-open"
+        if self.state == "half-open":
+            # Only one probe request at a time while half-open.
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        self.probing = False
+
+breaker = CircuitBreaker(settings.UPSTREAM_CIRCUIT_FAILURE_THRESHOLD, settings.UPSTREAM_CIRCUIT_RESET_TIMEOUT)
+
+# Additive increase / multiplicative decrease: the limit grows by about one
+# per round of successful requests and halves (at most once per
+# decrease_interval) when SWAPI throttles or times out.
+class AdaptiveLimiter:
+    decrease_interval = 1.0
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.active = 0
+        self.waiters = deque()
+        self.decreased_at = 0.0
+        self.loop = None
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        # Like the HTTP client, the bookkeeping belongs to one event loop.
+        if self.loop is not loop:
+            self.loop = loop
+            self.active = 0
+            self.waiters.clear()
+        while self.active >= int(self.limit):
+            waiter = loop.create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                elif self.active < int(self.limit):
+                    self.wake()
+                raise
+        self.active += 1
+
+    def release(self, overloaded: Optional[bool] = None):
+        if self.loop is not asyncio.get_running_loop():
+            return
+        self.active -= 1
+        if overloaded:
+            now = time.monotonic()
+            if now - self.decreased_at >= self.decrease_interval:
+                self.limit = max(self.minimum, self.limit / 2)
+                self.decreased_at = now
+        elif overloaded is not None:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self.wake()
+
+    def wake(self):
+        while self.waiters and self.active < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+limiter = AdaptiveLimiter(settings.UPSTREAM_CONCURRENCY_INITIAL, settings.UPSTREAM_CONCURRENCY_MIN, settings.UPSTREAM_CONCURRENCY_MAX)
+
+RETRY_STATUSES = {429, 502, 503, 504}
+OVERLOAD_STATUSES = {429, 503}
+
+async def send(url: str, client: httpx.AsyncClient) -> httpx.Response:
+    await limiter.acquire()
+    overloaded = None
+    try:
+        response = await client.get(url)
+        overloaded = response.status_code in OVERLOAD_STATUSES
+        return response
+    except httpx.TimeoutException:
+        overloaded = True
+        raise
+    except httpx.TransportError:
+        overloaded = False
+        raise
+    finally:
+        limiter.release(overloaded)
+
+def backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(settings.UPSTREAM_RETRY_BACKOFF_MAX, settings.UPSTREAM_RETRY_BACKOFF * 2 ** attempt))
+
+async def get_with_retries(url: str, client: httpx.AsyncClient) -> httpx.Response:
+    for attempt in range(settings.UPSTREAM_RETRIES + 1):
+        last = attempt == settings.UPSTREAM_RETRIES
+        response = error = None
+        try:
+            response = await send(url, client)
+        except httpx.TransportError as e:
+            if last:
+                raise
+            error = e
+        if response is not None and (response.status_code not in RETRY_STATUSES or last):
+            return response
+        delay = backoff_delay(attempt)
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            if response is not None:
+                return response
+            raise error
+        await asyncio.sleep(delay)
+
+async def guarded_get(url: str, client: httpx.AsyncClient) -> httpx.Response:
+    try:
+        response = await get_with_retries(url, client)
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+inflight = {}
+
+def _forget(url: str, task: asyncio.Task):
+    if inflight.get(url) is task:
+        del inflight[url]
+    if not task.cancelled():
+        task.exception()
+
+async def fetch(url: str, client: httpx.AsyncClient) -> httpx.Response:
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"Request deadline passed before fetching {url}")
+    task = inflight.get(url)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        if not breaker.allow():
+            raise CircuitOpenError(f"SWAPI circuit is open, not fetching {url}")
+        task = asyncio.ensure_future(guarded_get(url, client))
+        inflight[url] = task
+        task.add_done_callback(lambda done: _forget(url, done))
+    # Shielded so one caller giving up (or running out of time) does not
+    # cancel the fetch for the others.
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), remaining)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Request deadline passed while fetching {url}")
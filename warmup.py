@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+from cache import flush_popularity, remaining_freshness, set_objects, top_keys
+from config import settings
+from expansion import refresh_resource, resource_key
+from mirror import RESOURCES, crawl
+from upstream import create_http_client
+
+logger = logging.getLogger(__name__)
+
+async def warm_up_resource(resource: str, client: httpx.AsyncClient, concurrency: int) -> int:
+    started = time.monotonic()
+    stored = 0
+    done = 0
+
+    async def store_page(page: int, pages: int, data: dict):
+        nonlocal stored, done
+        items = data.get("results") or []
+        entities = {key: item for item in items if (key := resource_key(resource, item.get("url")))}
+        if page == 1:
+            # Same entry fetch_listing reads when the mirror is disabled.
+            entities[resource] = data
+        await set_objects(entities, settings.CACHE_TTL)
+        stored += len(items)
+        done += 1
+        logger.info(f"Warm-up {resource}: {done}/{pages} pages, {stored} items cached")
+
+    await crawl(resource, client, concurrency, store_page)
+    logger.info(f"Warm-up {resource}: {stored} items in {time.monotonic() - started:.2f}s")
+    return stored
+
+async def warm_up(client: httpx.AsyncClient, resources=RESOURCES, concurrency: int = None) -> int:
+    started = time.monotonic()
+    concurrency = concurrency or settings.WARMUP_CONCURRENCY
+    results = await asyncio.gather(*(warm_up_resource(resource, client, concurrency) for resource in resources), return_exceptions=True)
+    total = 0
+    for resource, result in zip(resources, results):
+        if isinstance(result, Exception):
+            logger.error(f"Warm-up failed for {resource}: {result}")
+        else:
+            total += result
+    logger.info(f"Warm-up finished: {total} items in {time.monotonic() - started:.2f}s")
+    return total
+
+async def refresh_popular(client: httpx.AsyncClient, limit: int = None, ahead: int = None, concurrency: int = None) -> int:
+    keys = await top_keys(limit or settings.POPULARITY_TOP_KEYS)
+    remaining = await remaining_freshness(keys)
+    ahead = settings.POPULARITY_REFRESH_AHEAD if ahead is None else ahead
+    expiring = [key for key in keys if remaining.get(key, 0) < ahead]
+    semaphore = asyncio.Semaphore(concurrency or settings.WARMUP_CONCURRENCY)
+
+    async def refresh_one(key: str):
+        async with semaphore:
+            try:
+                await refresh_resource(key, client)
+            except Exception as e:
+                logger.error(f"Error refreshing {key}: {e}")
+
+    await asyncio.gather(*(refresh_one(key) for key in expiring))
+    logger.info(f"Refreshed {len(expiring)} of the {len(keys)} most requested keys")
+    return len(expiring)
+
+async def run_popularity_loop(client: httpx.AsyncClient):
+    while True:
+        await asyncio.sleep(settings.POPULARITY_INTERVAL)
+        try:
+            await flush_popularity()
+            await refresh_popular(client)
+        except Exception as e:
+            logger.error(f"Popularity refresh failed: {e}")
+
+async def main(args):
+    async with create_http_client() as client:
+        if args.popular:
+            await refresh_popular(client, args.top, args.ahead, args.concurrency)
+        else:
+            await warm_up(client, args.resources or RESOURCES, args.concurrency)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the cache with every SWAPI resource, or refresh the most requested keys before they expire")
+    parser.add_argument("resources", nargs="*", help=f"resources to warm up (default: {', '.join(RESOURCES)})")
+    parser.add_argument("--concurrency", type=int, default=settings.WARMUP_CONCURRENCY)
+    parser.add_argument("--popular", action="store_true", help="refresh the most requested keys instead of crawling everything")
+    parser.add_argument("--top", type=int, default=settings.POPULARITY_TOP_KEYS)
+    parser.add_argument("--ahead", type=int, default=settings.POPULARITY_REFRESH_AHEAD, help="refresh keys that stay fresh for less than this many seconds")
+    args = parser.parse_args()
+    unknown = set(args.resources) - set(RESOURCES)
+    if unknown:
+        parser.error(f"unknown resources: {', '.join(sorted(unknown))}")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    asyncio.run(main(args))